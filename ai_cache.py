@@ -0,0 +1,441 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from config import (
+    AI_CACHE_DB, AI_CACHE_LEGACY_FILE, AI_CACHE_MEMORY_BYTES,
+    AI_CACHE_DISK_BYTES, AI_CACHE_TTLS,
+)
+
+
+class MemoryLRU:
+    """In-process LRU tier capped by the total size of the stored values"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        self._items = OrderedDict()  # key -> (payload, size, expires_at)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            payload, _, expires_at = item
+            if expires_at is not None and expires_at <= time.time():
+                self._drop(key)
+                return None
+            self._items.move_to_end(key)
+            return payload
+
+    def set(self, key, payload, size, expires_at=None):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (payload, size, expires_at)
+            self.bytes += size
+            while self.bytes > self.max_bytes and self._items:
+                oldest = next(iter(self._items))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, size, _ = self._items.pop(key)
+        self.bytes -= size
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+
+    def __len__(self):
+        return len(self._items)
+
+
+# Preset dictionary for compressing notes: boilerplate that nearly every
+# generated note, analysis and solution repeats. zlib matches against the
+# end of the dictionary first, so the most common strings come last.
+# Changing it requires a new codec name (entries record the codec they used).
+NOTES_DICTIONARY = "\n".join([
+    "Time and space complexity", "Space complexity breakdown", "Time complexity breakdown",
+    "Similar problems to practice", "Common pitfalls to avoid", "Interview tips", "Key takeaways",
+    "Edge cases to consider", "Pattern recognition tips", "Step-by-step", "Brute force",
+    "Anki flashcards (Q;A format)", "revision_status: \"new\"", "last_reviewed: \"\"", "pattern: ", "tags: [",
+    "HashMap<Integer, Integer> map = new HashMap<>();", "int[] dp = new int[n + 1];",
+    "for (int i = 0; i < n; i++) {", "while (left < right) {", "return result;",
+    "public int", "public boolean", "public class Solution {", "class Solution:", "def ",
+    "### Intuition", "### Approach", "### Hints", "### Optimal Solution", "### Brute-Force Approach",
+    "### Key Insights", "### Edge Cases", "### Complexity", "#### Time Complexity", "#### Space Complexity",
+    "## Problem Understanding", "## Approach", "## Solution Breakdown", "## Complexity Analysis",
+    "## Implementation Details", "## Learning Points", "## Code", "## Intuition", "## Hints",
+    "## Problem Statement and Examples", "## General Solution for Pattern", "## Brute-Force Approach",
+    "## Optimal Solution Breakdown", "## Code (Java)", "**Time Complexity:** O(n)",
+    "**Space Complexity:** O(1)", "**Example:**", "**Input:**", "**Output:**", "**Explanation:**",
+    "```java\n", "```python\n", "```\n", "\n---\n", "\n- ", "\n\n",
+]).encode("utf-8")
+
+COMPRESS_MIN_BYTES = 256  # smaller values are stored as-is
+LAST_ACCESS_RESOLUTION = 60  # seconds; LRU recency is only refreshed this often per entry
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+
+def _zstd_dict():
+    return zstandard.ZstdCompressionDict(NOTES_DICTIONARY, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+
+
+def encode_value(value):
+    """Compress a response for storage; returns (codec, blob)"""
+    raw = value.encode("utf-8")
+    if len(raw) < COMPRESS_MIN_BYTES:
+        return "raw", raw
+    if zstandard is not None:
+        return "zstd-d1", zstandard.ZstdCompressor(level=9, dict_data=_zstd_dict()).compress(raw)
+    compressor = zlib.compressobj(level=9, zdict=NOTES_DICTIONARY)
+    return "zlib-d1", compressor.compress(raw) + compressor.flush()
+
+
+def decode_value(codec, blob):
+    """Inverse of encode_value"""
+    if codec == "raw":
+        return blob.decode("utf-8") if isinstance(blob, bytes) else blob
+    if codec == "zlib-d1":
+        decompressor = zlib.decompressobj(zdict=NOTES_DICTIONARY)
+        return (decompressor.decompress(blob) + decompressor.flush()).decode("utf-8")
+    if codec == "zstd-d1":
+        if zstandard is None:
+            raise ValueError("zstandard is required to read zstd-compressed cache entries")
+        return zstandard.ZstdDecompressor(dict_data=_zstd_dict()).decompress(blob).decode("utf-8")
+    raise ValueError(f"Unknown cache codec: {codec}")
+
+
+class AICache:
+    """Two-tier store for AI responses.
+
+    Tier 1 is a byte-bounded in-memory LRU that serves Streamlit reruns
+    without touching disk. Tier 2 is an SQLite table with single-row
+    lookups, a total size budget and per-family TTLs. Both tiers hold
+    compressed entries (see encode_value) that are decoded on read, and
+    both budgets count compressed bytes.
+    """
+
+    def __init__(self, db_path=AI_CACHE_DB, legacy_file=AI_CACHE_LEGACY_FILE,
+                 memory_bytes=AI_CACHE_MEMORY_BYTES, disk_bytes=AI_CACHE_DISK_BYTES, ttls=None):
+        self.db_path = db_path
+        self.legacy_file = legacy_file
+        self.disk_bytes = disk_bytes
+        self.ttls = dict(AI_CACHE_TTLS if ttls is None else ttls)
+        self.memory = MemoryLRU(memory_bytes)
+        self.stats_counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "disk_evictions": 0,
+            "writes": 0,
+            "decodes": 0,
+            "decode_seconds": 0.0,
+        }
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._init_db()
+        self._import_legacy_json()
+
+    def _connect(self):
+        """Return a connection owned by the calling thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; write transactions are opened explicitly by _transaction()
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 30000")
+            conn.execute("PRAGMA synchronous = NORMAL")  # durable at checkpoints; safe with WAL
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database write lock up front.
+
+        Taking the lock at BEGIN (instead of on the first write) means two
+        processes can never both read a value and then overwrite each
+        other's update.
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode = WAL")
+        with self._transaction():
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(responses)")}
+            # Columns added after the first release of the SQLite cache
+            if "family" not in columns:
+                conn.execute("ALTER TABLE responses ADD COLUMN family TEXT NOT NULL DEFAULT 'default'")
+            if "size" not in columns:
+                conn.execute("ALTER TABLE responses ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+                conn.execute("UPDATE responses SET size = LENGTH(CAST(value AS BLOB))")
+            if "expires_at" not in columns:
+                conn.execute("ALTER TABLE responses ADD COLUMN expires_at REAL")
+            if "last_access" not in columns:
+                conn.execute("ALTER TABLE responses ADD COLUMN last_access REAL NOT NULL DEFAULT 0")
+                conn.execute("UPDATE responses SET last_access = created_at")
+            if "codec" not in columns:
+                conn.execute("ALTER TABLE responses ADD COLUMN codec TEXT NOT NULL DEFAULT 'raw'")
+            if "raw_size" not in columns:
+                conn.execute("ALTER TABLE responses ADD COLUMN raw_size INTEGER NOT NULL DEFAULT 0")
+                conn.execute("UPDATE responses SET raw_size = size")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_expires_at ON responses (expires_at)")
+            if not conn.execute("SELECT 1 FROM meta WHERE name = 'disk_bytes'").fetchone():
+                conn.execute(
+                    "INSERT INTO meta (name, value) SELECT 'disk_bytes', COALESCE(SUM(size), 0) FROM responses"
+                )
+
+    def _add_disk_bytes(self, conn, delta):
+        """Adjust the shared size total inside the caller's transaction; returns the new total"""
+        conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + ? WHERE name = 'disk_bytes'", (delta,))
+        return self._disk_bytes_used(conn)
+
+    def _disk_bytes_used(self, conn=None):
+        row = (conn or self._connect()).execute("SELECT CAST(value AS INTEGER) FROM meta WHERE name = 'disk_bytes'").fetchone()
+        return row[0] if row else 0
+
+    def _import_legacy_json(self):
+        """One-shot import of an existing ai_cache.json into the store"""
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return
+        if self._connect().execute("SELECT 1 FROM meta WHERE name = 'legacy_imported'").fetchone():
+            return
+        try:
+            with open(self.legacy_file, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Could not read legacy AI cache {self.legacy_file}: {e}")
+            legacy = {}
+        now = time.time()
+        rows = []
+        for k, v in legacy.items():
+            if isinstance(v, str):
+                codec, blob = encode_value(v)
+                rows.append((k, blob, codec, now, len(blob), len(v.encode("utf-8")), now))
+        with self._transaction() as conn:
+            # Another process may have imported while we were reading the file
+            if conn.execute("SELECT 1 FROM meta WHERE name = 'legacy_imported'").fetchone():
+                return
+            before = conn.total_changes
+            conn.executemany(
+                """INSERT OR IGNORE INTO responses (key, value, codec, created_at, size, raw_size, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                rows,
+            )
+            if conn.total_changes > before:
+                conn.execute(
+                    "UPDATE meta SET value = (SELECT COALESCE(SUM(size), 0) FROM responses) WHERE name = 'disk_bytes'"
+                )
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('legacy_imported', ?)", (str(now),))
+        print(f"📦 Imported {len(rows)} cached AI responses from {self.legacy_file}")
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats_counters[name] += amount
+
+    def _expiry(self, family):
+        ttl = self.ttls.get(family, self.ttls.get("default"))
+        return time.time() + ttl if ttl else None
+
+    def get(self, key):
+        """Return the cached response for key, or None"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            value = self._decode(key, *entry)
+            if value is not None:
+                self._count("memory_hits")
+            return value
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT codec, value, expires_at, size, last_access FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+        codec, blob, expires_at, size, last_access = row
+        now = time.time()
+        if expires_at is not None and expires_at <= now:
+            self._delete(key)
+            self._count("expired")
+            self._count("misses")
+            return None
+        if now - last_access > LAST_ACCESS_RESOLUTION:
+            # Coarse LRU clock: most reads stay read-only and never wait on the write lock
+            with self._transaction():
+                conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        value = self._decode(key, codec, blob)
+        if value is not None:
+            self.memory.set(key, (codec, blob), size, expires_at)
+            self._count("disk_hits")
+        return value
+
+    def _decode(self, key, codec, blob):
+        """Decoded entry, or None (a miss) after dropping an entry this machine can't decode"""
+        started = time.perf_counter()
+        try:
+            value = decode_value(codec, blob)
+        except Exception as e:
+            # e.g. a zstd entry written where zstandard is installed, read where it isn't
+            print(f"⚠️ Dropping undecodable AI cache entry ({codec}): {e}")
+            self.memory.discard(key)
+            self._delete(key)
+            self._count("misses")
+            return None
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.stats_counters["decodes"] += 1
+            self.stats_counters["decode_seconds"] += elapsed
+        return value
+
+    def set(self, key, value, family="default"):
+        """Insert or replace a cached response under the TTL of its family"""
+        codec, blob = encode_value(value)
+        size = len(blob)
+        expires_at = self._expiry(family)
+        now = time.time()
+        with self._transaction() as conn:
+            old = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                """INSERT OR REPLACE INTO responses
+                   (key, value, codec, created_at, family, size, raw_size, expires_at, last_access)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (key, blob, codec, now, family, size, len(value.encode("utf-8")), expires_at, now),
+            )
+            disk_used = self._add_disk_bytes(conn, size - (old[0] if old else 0))
+        self.memory.set(key, (codec, blob), size, expires_at)
+        self._count("writes")
+        if disk_used > self.disk_bytes:
+            self.evict()
+
+    def _delete(self, key):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._add_disk_bytes(conn, -row[0])
+
+    def evict(self):
+        """Drop expired rows, then least recently used rows until under the disk budget"""
+        now = time.time()
+        target = int(self.disk_bytes * 0.9)  # leave headroom so we don't evict on every write
+        with self._transaction() as conn:
+            expired = conn.execute(
+                "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (now,),
+            ).fetchone()
+            conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            disk_used = self._add_disk_bytes(conn, -expired[0])
+            evicted = 0
+            while disk_used > target:
+                rows = conn.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 100").fetchall()
+                if not rows:
+                    break
+                victims = []
+                freed = 0
+                for key, size in rows:
+                    victims.append((key,))
+                    freed += size
+                    if disk_used - freed <= target:
+                        break
+                conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+                disk_used = self._add_disk_bytes(conn, -freed)
+                evicted += len(victims)
+        self._count("expired", expired[1])
+        self._count("disk_evictions", evicted)
+
+    def stats(self):
+        """Hit/miss/eviction counters and tier sizes for tuning"""
+        with self._stats_lock:
+            stats = dict(self.stats_counters)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats.update({
+            "memory_evictions": self.memory.evictions,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.bytes,
+            "memory_max_bytes": self.memory.max_bytes,
+            "disk_bytes": self._disk_bytes_used(),
+            "disk_max_bytes": self.disk_bytes,
+            "hit_ratio": (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0,
+            "avg_decode_ms": 1000 * stats["decode_seconds"] / stats["decodes"] if stats["decodes"] else 0.0,
+        })
+        return stats
+
+    def compression_report(self, sample_size=200):
+        """Disk savings from compression and the measured cost of decoding a sample of entries"""
+        conn = self._connect()
+        entries, raw_bytes, stored_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        sample = conn.execute(
+            "SELECT codec, value, raw_size FROM responses WHERE codec != 'raw' ORDER BY RANDOM() LIMIT ?",
+            (sample_size,),
+        ).fetchall()
+        started = time.perf_counter()
+        for codec, blob, _ in sample:
+            try:
+                decode_value(codec, blob)
+            except Exception:
+                pass  # dropped on its next get()
+        elapsed = time.perf_counter() - started
+        sample_raw = sum(row[2] for row in sample)
+        return {
+            "entries": entries,
+            "raw_bytes": raw_bytes,
+            "stored_bytes": stored_bytes,
+            "compression_ratio": raw_bytes / stored_bytes if stored_bytes else 1.0,
+            "sampled_entries": len(sample),
+            "avg_decode_ms": 1000 * elapsed / len(sample) if sample else 0.0,
+            "decode_mb_per_s": sample_raw / elapsed / 1e6 if elapsed else 0.0,
+        }
+
+    def __contains__(self, key):
+        return self._connect().execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide AI cache, opening it on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AICache()
+    return _cache
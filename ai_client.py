@@ -3,72 +3,856 @@ import json
 import time
 import os
 import hashlib
-from config import USE_GROQ, GROQ_API_KEY, OPENROUTER_API_KEY
+import textwrap
+import threading
+import asyncio
+import functools
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+from config import (
+    USE_GROQ, GROQ_API_KEY, OPENROUTER_API_KEY, GROQ_API_URL, OPENROUTER_API_URL,
+    AI_HTTP_POOL_CONNECTIONS, AI_HTTP_POOL_MAXSIZE, AI_CONNECT_TIMEOUT, AI_READ_TIMEOUT,
+    AI_MAX_CONCURRENCY, AI_BATCH_CHECKPOINT_DIR, AI_TASK_PROFILES,
+    AI_MODEL_CONTEXT_WINDOWS, AI_DEFAULT_CONTEXT_WINDOW, AI_PROMPT_SAFETY_MARGIN,
+)
+from ai_cache import get_cache
+from ai_limits import get_rate_limiter, parse_retry_after, backoff_delay
+from ai_router import get_router
+from ai_tokens import estimate_tokens, fit_sections, trim_text
+from ai_metrics import get_metrics, start_metrics_server
+from prompt_templates import get_template
 
-CACHE_FILE = "ai_cache.json"
+_session = None
+_session_lock = threading.Lock()
+start_metrics_server()
 
-def _get_cache():
-    try:
-        with open(CACHE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+def get_http_session():
+    """Process-wide keep-alive session shared by all provider calls"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=AI_HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=AI_HTTP_POOL_MAXSIZE,
+                    pool_block=True,  # wait for a free connection instead of opening extra ones
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def get_task_profile(family="default"):
+    """Routing profile for a prompt family: the default profile overlaid with the family's entries"""
+    default = AI_TASK_PROFILES["default"]
+    profile = {**default, **AI_TASK_PROFILES.get(family, {})}
+    profile["models"] = {**default.get("models", {}), **AI_TASK_PROFILES.get(family, {}).get("models", {})}
+    return profile
+
+def _timeouts(family="default"):
+    """(connect, read) timeout pair for provider requests of a family"""
+    return (AI_CONNECT_TIMEOUT, get_task_profile(family).get("timeout", AI_READ_TIMEOUT))
+
+# Bump CACHE_KEY_SCHEME to invalidate every cached answer, or a family's
+# version to invalidate only that family. Prompts rendered from
+# prompt_templates also carry the template fingerprint in their key.
+CACHE_KEY_SCHEME = 2
+PROMPT_FAMILY_VERSIONS = {
+    "notes": 1,
+    "bundle": 1,
+    "solution": 1,
+    "analysis": 1,
+    "pattern": 1,
+    "flashcards": 1,
+    "chat": 1,
+    "default": 1,
+}
+
+def normalize_prompt(prompt):
+    """Canonical form of a prompt: common indentation and trailing whitespace removed"""
+    lines = [line.rstrip() for line in textwrap.dedent(prompt.expandtabs(4)).splitlines()]
+    text = "\n".join(lines).strip("\n")
+    while "\n\n\n" in text:
+        text = text.replace("\n\n\n", "\n\n")
+    return text
+
+def _provider_settings(provider, model=None, family="default"):
+    """Resolve (model, sampling params) for a provider from the family's task profile.
+
+    Part of the cache key, so answers from different models never collide.
+    """
+    profile = get_task_profile(family)
+    params = {"temperature": profile["temperature"], "max_tokens": profile["max_tokens"]}
+    return model or profile["models"][provider], params
+
+def make_cache_key(prompt, provider, model=None, family="default", params=None, template=None):
+    """Versioned cache key over family, template, provider, model, sampling params and the normalized prompt"""
+    resolved_model, default_params = _provider_settings(provider, model, family)
+    canonical = json.dumps({
+        "prompt": normalize_prompt(prompt),
+        "provider": provider,
+        "model": resolved_model,
+        "params": params if params is not None else default_params,
+    }, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    version = PROMPT_FAMILY_VERSIONS.get(family, PROMPT_FAMILY_VERSIONS["default"])
+    if template:
+        version = f"{version}/{template}"
+    return f"v{CACHE_KEY_SCHEME}:{family}:{version}:{provider}:{digest}"
+
+def prompt_budget(family="default", model=None):
+    """Tokens a prompt of this family may use on every configured provider.
+
+    The smallest context window among the family's models, less its
+    max_tokens completion reserve and the estimator safety margin, capped by
+    the profile's optional max_prompt_tokens.
+    """
+    profile = get_task_profile(family)
+    providers = _available_providers() or list(profile["models"])
+    budgets = []
+    for provider in providers:
+        resolved_model, params = _provider_settings(provider, model, family)
+        window = AI_MODEL_CONTEXT_WINDOWS.get(resolved_model, AI_DEFAULT_CONTEXT_WINDOW)
+        budgets.append(int((window - params["max_tokens"]) * (1 - AI_PROMPT_SAFETY_MARGIN)))
+    budget = min(budgets)
+    if profile.get("max_prompt_tokens"):
+        budget = min(budget, profile["max_prompt_tokens"])
+    return max(0, budget)
+
+def fit_prompt(build, family="default", model=None, code=None, text=None, reserve=0):
+    """Render build(**sections) trimmed to the family's prompt budget.
+
+    code and text map build's keyword arguments to user-supplied content;
+    oversized code loses boilerplate and then its middle, oversized text is
+    summarized to its headings and paragraph leads. Everything else in the
+    template is kept as is. reserve tokens are left free for text appended
+    later (e.g. JSON instructions).
+    """
+    code, text = code or {}, text or {}
+    # Render non-string content (e.g. a parsed analysis dict) the way an f-string would
+    sections = {name: str(value) if value else "" for name, value in {**text, **code}.items()}
+    overhead = estimate_tokens(build(**{name: "" for name in sections}))
+    available = prompt_budget(family, model) - overhead - reserve
+    fitted = fit_sections(sections, available, code=tuple(code))
+    trimmed = [name for name in sections if fitted[name] != sections[name]]
+    if trimmed:
+        print(f"✂️ Trimmed {', '.join(trimmed)} to fit the {family} prompt budget ({available} tokens)")
+    return build(**fitted)
+
+def render_template(name, model=None, code_sections=None, text_sections=None, reserve=0, **variables):
+    """(prompt, template) for a registered prompt template.
+
+    code_sections/text_sections hold user-supplied variables that fit_prompt
+    may trim to the template family's budget; the rest are used as given.
+    """
+    template = get_template(name)
+    build = functools.partial(template.render, **variables)
+    if code_sections or text_sections:
+        return fit_prompt(build, template.family, model, code=code_sections, text=text_sections,
+                          reserve=reserve), template
+    return build(), template
+
+def call_template(name, model=None, code_sections=None, text_sections=None, parse_json=False, schema=None,
+                  **variables):
+    """Render a prompt template and send it through call_ai_api under the template's family and fingerprint"""
+    reserve = _json_reserve(schema) if parse_json else 0
+    prompt, template = render_template(name, model, code_sections, text_sections, reserve=reserve, **variables)
+    return call_ai_api(prompt, model, family=template.family, parse_json=parse_json, schema=schema,
+                       template=template.fingerprint)
+
+def stream_template(name, model=None, code_sections=None, text_sections=None, **variables):
+    """Streaming counterpart of call_template"""
+    prompt, template = render_template(name, model, code_sections, text_sections, **variables)
+    return stream_ai_api(prompt, model, family=template.family, template=template.fingerprint)
+
+def _enforce_budget(prompt, family="default", model=None):
+    """Last-resort trim for prompts that were not built with fit_prompt.
 
-def _save_cache(cache):
-    with open(CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(cache, f, indent=2, ensure_ascii=False)
+    JSON instructions appended by call_ai_json are kept whole; only the text
+    before them is trimmed.
+    """
+    budget = prompt_budget(family, model)
+    if estimate_tokens(prompt) <= budget:
+        return prompt
+    print(f"✂️ {family} prompt exceeds its {budget} token budget; trimming")
+    body, tail = _split_json_instructions(prompt)
+    return trim_text(body, max(budget - estimate_tokens(tail), 0)) + tail
 
-def _prompt_hash(prompt):
-    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+def _available_providers():
+    """Providers in preference order, given the configured keys"""
+    providers = []
+    if USE_GROQ and GROQ_API_KEY:
+        providers.append("groq")
+    if OPENROUTER_API_KEY:
+        providers.append("openrouter")
+    return providers
 
-def call_ai_api(prompt: str, model: str = None, max_retries=3):
-    """Unified AI interface with automatic failover and retries, now with JSON cache"""
-    cache = _get_cache()
-    key = _prompt_hash(prompt)
-    if key in cache:
-        return cache[key]
+def is_cached(prompt, model=None, family="default", template=None):
+    """Whether call_ai_api would answer prompt from the cache"""
+    cache = get_cache()
+    prompt = _enforce_budget(normalize_prompt(prompt), family, model)
+    return any(cache.get(make_cache_key(prompt, provider, model, family, template=template)) is not None
+               for provider in _available_providers())
+
+def _record_call(family, cache_result, started):
+    """Metrics for one call_ai_api/stream_ai_api call"""
+    metrics = get_metrics()
+    metrics.inc("ai_calls_total", family=family, cache=cache_result)
+    metrics.observe("ai_call_seconds", time.monotonic() - started, family=family, cache=cache_result)
+
+def _record_request(provider, model, family, outcome, queue_wait, latency, prompt_tokens, completion_tokens=None):
+    """Metrics for one provider request"""
+    metrics = get_metrics()
+    model = _provider_settings(provider, model, family)[0]
+    metrics.inc("ai_requests_total", provider=provider, model=model, outcome=outcome)
+    metrics.observe("ai_queue_wait_seconds", queue_wait, provider=provider)
+    if outcome == "cancelled":
+        return
+    metrics.observe("ai_request_seconds", latency, provider=provider, model=model)
+    metrics.observe("ai_prompt_tokens", prompt_tokens, provider=provider, model=model)
+    if completion_tokens is not None:
+        metrics.observe("ai_completion_tokens", completion_tokens, provider=provider, model=model)
+
+def get_cache_stats():
+    """Hit, miss and eviction counters of the AI response cache"""
+    return get_cache().stats()
+
+def get_cache_compression_report(sample_size=200):
+    """Compression ratio of the stored responses and measured decode cost"""
+    return get_cache().compression_report(sample_size)
+
+def call_ai_api(prompt: str, model: str = None, max_retries=3, family: str = "default",
+                parse_json: bool = False, schema: dict = None, template: str = None):
+    """Unified AI interface with automatic failover and retries, backed by the two-tier response cache.
+
+    family selects the cache TTL (see AI_CACHE_TTLS), e.g. "notes" or "chat".
+    template is the fingerprint of the prompt template the prompt was rendered
+    from (see call_template). With parse_json=True the answer is parsed into a
+    dict (see call_ai_json).
+    """
+    if parse_json:
+        return call_ai_json(prompt, schema=schema, model=model, max_retries=max_retries, family=family,
+                            template=template)
+    started = time.monotonic()
+    cache = get_cache()
+    prompt = _enforce_budget(normalize_prompt(prompt), family, model)
+    providers = _available_providers()
+    keys = {provider: make_cache_key(prompt, provider, model, family, template=template) for provider in providers}
+    for provider in providers:
+        cached = cache.get(keys[provider])
+        if cached is not None:
+            _record_call(family, "hit", started)
+            return cached
     
     # Check if API keys are configured
-    if not GROQ_API_KEY and not OPENROUTER_API_KEY:
+    if not providers:
         print("⚠️ No API keys found. Using fallback response.")
-        return get_fallback_response(prompt)
+        _record_call(family, "fallback", started)
+        return get_fallback_response(prompt, family)
     
+    response = _single_flight(
+        keys[providers[0]],
+        lambda: _call_providers(prompt, model, max_retries, family, keys),
+    )
+    _record_call(family, "miss", started)
+    return response
+
+def extract_json(text):
+    """Parse the first JSON object in a model answer, tolerating code fences and chatter around it"""
+    if not text:
+        return None
+    start = text.find("{")
+    end = text.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+_JSON_TYPES = {
+    "string": str,
+    "array": list,
+    "object": dict,
+    "boolean": bool,
+    "integer": int,
+    "number": (int, float),
+}
+
+def validate_json(data, schema, prefix=""):
+    """Names of required fields that are missing or have the wrong type.
+
+    Supports the subset of JSON Schema we use: nested "object" properties
+    with "required" lists, primitive "type"s, "enum", and "items" types.
+    """
+    invalid = []
+    properties = schema.get("properties", {})
+    for name in schema.get("required", list(properties)):
+        spec = properties.get(name, {})
+        value = data.get(name) if isinstance(data, dict) else None
+        path = f"{prefix}{name}"
+        expected = _JSON_TYPES.get(spec.get("type"))
+        if value is None or value == "" or (expected and not isinstance(value, expected)):
+            invalid.append(path)
+        elif "enum" in spec and value not in spec["enum"]:
+            invalid.append(path)
+        elif spec.get("type") == "object" and spec.get("properties"):
+            invalid.extend(validate_json(value, spec, prefix=f"{path}."))
+        elif spec.get("type") == "array" and "items" in spec:
+            item_type = _JSON_TYPES.get(spec["items"].get("type"))
+            if item_type and not all(isinstance(item, item_type) for item in value):
+                invalid.append(path)
+    return invalid
+
+_JSON_INSTRUCTIONS_HEAD = "Respond with ONLY a single valid JSON object"
+
+def _json_instructions(schema):
+    if not schema:
+        return f"{_JSON_INSTRUCTIONS_HEAD}. No Markdown fences, no text before or after it."
+    return (
+        f"{_JSON_INSTRUCTIONS_HEAD} matching this JSON schema. "
+        "No Markdown fences, no text before or after it. Put Markdown content inside JSON strings.\n"
+        f"JSON schema:\n{json.dumps(schema, indent=1)}"
+    )
+
+def _json_reserve(schema):
+    """Tokens to leave free in a templated prompt for call_ai_json's instructions and re-ask line"""
+    fields = ", ".join((schema or {}).get("properties", {}))
+    return estimate_tokens(
+        f"\n\nYour previous answer was not valid JSON.\nOnly these fields are needed now: {fields}.\n"
+        f"{_json_instructions(schema)}"
+    )
+
+def _split_json_instructions(prompt):
+    """(body, tail) where tail is the paragraph carrying call_ai_json's instructions, or empty"""
+    head = prompt.rfind(_JSON_INSTRUCTIONS_HEAD)
+    if head < 0:
+        return prompt, ""
+    start = prompt.rfind("\n\n", 0, head)
+    start = head if start < 0 else start
+    return prompt[:start], prompt[start:]
+
+def call_ai_json(prompt: str, schema: dict = None, model: str = None, max_retries=3,
+                 family: str = "default", max_reasks: int = 1, template: str = None):
+    """Ask for a JSON answer and return it as a dict.
+
+    The answer is validated against schema. If some top-level fields are
+    missing or malformed, a targeted follow-up asks for just those fields
+    (at most max_reasks times) and merges them in. Whatever could be
+    obtained is returned, possibly an empty dict; callers handle gaps.
+    """
+    data = extract_json(call_ai_api(f"{prompt}\n\n{_json_instructions(schema)}", model, max_retries, family,
+                                    template=template)) or {}
+    for _ in range(max_reasks):
+        invalid = validate_json(data, schema) if schema else ([] if data else ["<answer>"])
+        if not invalid:
+            break
+        missing = sorted({path.split(".")[0] for path in invalid})
+        print(f"🔁 Re-asking for missing JSON fields: {', '.join(missing)}")
+        if schema and data:
+            sub_schema = {
+                "type": "object",
+                "properties": {name: schema["properties"][name] for name in missing if name in schema.get("properties", {})},
+                "required": missing,
+            }
+            follow_up = (
+                f"{prompt}\n\nOnly these fields are needed now: {', '.join(missing)}.\n"
+                f"{_json_instructions(sub_schema)}"
+            )
+        else:
+            follow_up = f"{prompt}\n\nYour previous answer was not valid JSON.\n{_json_instructions(schema)}"
+        data.update(extract_json(call_ai_api(follow_up, model, max_retries, family, template=template)) or {})
+    return data
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+class _FlightAbandoned(Exception):
+    """The leading request stopped without an answer to share (e.g. an abandoned stream)"""
+
+def _join_flight(key):
+    """(future, leader) for key; the leader must end the flight with _end_flight"""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+    return future, leader
+
+def _end_flight(key, future, result=None, error=None):
+    with _inflight_lock:
+        _inflight.pop(key, None)
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+def _single_flight(key, fn):
+    """Run fn once per key at a time; concurrent callers with the same key share its result.
+
+    Covers Streamlit reruns, double clicks and other sessions in this process
+    sending an identical prompt while the first request (blocking, streamed
+    or prefetched) is still pending.
+    """
+    future, leader = _join_flight(key)
+    if not leader:
+        print("⏳ Identical AI request already in flight, waiting for it")
+        try:
+            return future.result()
+        except _FlightAbandoned:
+            return _single_flight(key, fn)
+    try:
+        result = fn()
+    except BaseException as e:
+        _end_flight(key, future, error=e)
+        raise
+    _end_flight(key, future, result)
+    return result
+
+def _call_providers(prompt, model, max_retries, family, keys):
+    """Send prompt through the provider router with retries, caching the first good answer"""
+    cache = get_cache()
+    router = get_router()
+    providers = list(keys)
     for attempt in range(max_retries):
+        order = router.order(providers)
         try:
-            if USE_GROQ and GROQ_API_KEY:
-                print(f"🤖 Using Groq API (attempt {attempt + 1})")
-                response = call_groq_api(prompt, model)
-                if response and response.strip():
-                    cache[key] = response
-                    _save_cache(cache)
-                    return response
-                else:
-                    print(f"⚠️ Groq API returned empty response (attempt {attempt + 1})")
-            elif OPENROUTER_API_KEY:
-                print(f"🤖 Using OpenRouter API (attempt {attempt + 1})")
-                response = call_openrouter_api(prompt, model)
-                if response and response.strip():
-                    cache[key] = response
-                    _save_cache(cache)
-                    return response
-                else:
-                    print(f"⚠️ OpenRouter API returned empty response (attempt {attempt + 1})")
-            else:
-                print("⚠️ No valid API configuration found. Using fallback response.")
-                return get_fallback_response(prompt)
-        except Exception as e:
+            provider, response = _hedged_request(order, prompt, model, attempt, family)
+            cache.set(keys[provider], response, family)
+            get_metrics().observe("ai_retries", attempt, family=family)
+            return response
+        except AIFatalError as e:
+            get_metrics().observe("ai_retries", attempt, family=family)
+            print(f"❌ AI Error (not retryable): {e}")
+            print("⚠️ All API attempts failed. Using fallback response.")
+            return get_fallback_response(prompt, family)
+        except AIProviderError as e:
             print(f"❌ AI Error (attempt {attempt+1}): {e}")
-            time.sleep(2)  # Wait before retrying
             if attempt == max_retries - 1:
+                get_metrics().observe("ai_retries", attempt, family=family)
                 print("⚠️ All API attempts failed. Using fallback response.")
-                return get_fallback_response(prompt)
+                return get_fallback_response(prompt, family)
+            delay = backoff_delay(attempt, getattr(e, "retry_after", None))
+            print(f"⏳ Retrying in {delay:.1f}s")
+            time.sleep(delay)
     
     # If we get here, return fallback
-    return get_fallback_response(prompt)
+    return get_fallback_response(prompt, family)
+
+def _hedged_request(order, prompt, model, attempt=0, family="default"):
+    """Ask order[0]; if it has not answered within its p95-based deadline, hedge to
+    the next provider and keep whichever answers first. Failures fail over
+    to the next provider immediately. Returns (provider, response)."""
+    router = get_router()
+    pool = _get_hedge_executor()
+    remaining = list(order)
+    pending = {}
+    cancels = {}
+    errors = []
+
+    def launch():
+        provider = remaining.pop(0)
+        print(f"🤖 Using {PROVIDER_NAMES[provider]} API (attempt {attempt + 1})")
+        cancels[provider] = threading.Event()
+        pending[pool.submit(_timed_request, provider, prompt, model, cancels[provider], family)] = provider
+        return router.hedge_delay(provider, _provider_settings(provider, model, family)[0])
+
+    deadline = launch()
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=deadline if remaining else None, return_when=FIRST_COMPLETED)
+            if not done:
+                print(f"⏱️ No answer after {deadline:.1f}s, hedging to {PROVIDER_NAMES[remaining[0]]}")
+                deadline = launch()
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    errors.append(e if isinstance(e, AIProviderError) else AIRetryableError(str(e)))
+                    if remaining and not pending:
+                        deadline = launch()
+                    continue
+                for other_future, other in pending.items():
+                    # Drop the slower request: skip it if not started, discard its answer otherwise
+                    cancels[other].set()
+                    if other_future.cancel():
+                        router.release(other)
+                return provider, response
+        raise _combine_errors(errors)
+    finally:
+        for provider in remaining:
+            router.release(provider)
+
+def _combine_errors(errors):
+    """One error for a round in which every provider failed.
+
+    Retryable if any provider may recover; the retry_after is the shortest
+    wait any provider asked for.
+    """
+    message = "; ".join(str(e) for e in errors) or "no provider available"
+    if errors and all(isinstance(e, AIFatalError) for e in errors):
+        return AIFatalError(message)
+    waits = [e.retry_after for e in errors if getattr(e, "retry_after", None) is not None]
+    return AIRetryableError(message, retry_after=min(waits) if waits else None)
+
+def _timed_request(provider, prompt, model, cancel_event, family="default"):
+    """One provider request with rate limiting and health bookkeeping.
+
+    Every failure comes out as an AIProviderError, with the concurrency slot
+    and any half-open probe slot given back.
+    """
+    router = get_router()
+    limiter = get_rate_limiter(provider)
+    prompt_tokens = estimate_tokens(prompt)
+    queued = time.monotonic()
+    limiter.acquire(prompt_tokens)
+    if cancel_event.is_set():
+        router.release(provider)
+        _record_request(provider, model, family, "cancelled", time.monotonic() - queued, 0, prompt_tokens)
+        raise AIRequestCancelled("cancelled before sending")
+    limiter.concurrency.acquire()
+    started = time.monotonic()
+    queue_wait = started - queued
+    try:
+        try:
+            response = _request_completion(provider, prompt, model, family)
+        except AIProviderError:
+            raise
+        except Exception as e:
+            # Anything else (a connection error from a custom session, a bad payload...) is a provider failure too
+            raise AIRetryableError(f"{PROVIDER_NAMES.get(provider, provider)} request failed: {e}") from e
+    except AIRateLimitError as e:
+        # The provider is healthy but busy: back off instead of tripping its circuit
+        limiter.concurrency.release(rate_limited=True)
+        limiter.pause(e.retry_after if e.retry_after is not None else backoff_delay(0))
+        router.release(provider)
+        _record_request(provider, model, family, "rate_limited", queue_wait, time.monotonic() - started, prompt_tokens)
+        raise
+    except AIProviderError:
+        limiter.concurrency.release()
+        router.record_failure(provider)
+        _record_request(provider, model, family, "error", queue_wait, time.monotonic() - started, prompt_tokens)
+        raise
+    except BaseException:
+        limiter.concurrency.release()
+        router.release(provider)
+        raise
+    limiter.concurrency.release()
+    latency = time.monotonic() - started
+    router.record_success(provider, latency, _provider_settings(provider, model, family)[0])
+    completion_tokens = estimate_tokens(response)
+    limiter.record_completion(completion_tokens)
+    _record_request(provider, model, family, "success", queue_wait, latency, prompt_tokens, completion_tokens)
+    print(f"🔢 {provider} {family}: ~{prompt_tokens} prompt + ~{completion_tokens} completion tokens")
+    if cancel_event.is_set():
+        raise AIRequestCancelled("another provider answered first")
+    return response
+
+def _iter_sse_deltas(response):
+    """Yield content deltas from an OpenAI-compatible chat-completions SSE stream"""
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        try:
+            chunk = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        choices = chunk.get("choices") or []
+        if choices:
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+def _stream_provider(provider, prompt, model=None, family="default"):
+    """Open a streaming chat completion against one provider and yield deltas"""
+    api_key, url = _provider_endpoint(provider)
+    model, params = _provider_settings(provider, model, family)
+    payload = {
+        "messages": [{"role": "user", "content": prompt}],
+        "model": model,
+        "stream": True,
+        **params
+    }
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream"
+    }
+    print(f"📡 Streaming from {provider} with model: {model}")
+    with get_http_session().post(url, headers=headers, json=payload, timeout=_timeouts(family), stream=True) as response:
+        _check_status(provider, response)
+        yield from _iter_sse_deltas(response)
+
+def stream_ai_api(prompt: str, model: str = None, family: str = "default", template: str = None):
+    """Like call_ai_api but yields the answer incrementally as the provider streams it.
+
+    Cache hits are yielded in one piece. The assembled text is cached once
+    the stream completes. If a provider fails before sending anything, the
+    next one is tried, and finally the blocking call_ai_api path. Streams
+    take part in single-flight: an identical request already in flight
+    (blocking, streamed or prefetched) is waited for and its answer yielded
+    whole, and identical requests made while this one streams get its text.
+    """
+    call_started = time.monotonic()
+    cache = get_cache()
+    prompt = _enforce_budget(normalize_prompt(prompt), family, model)
+    providers = _available_providers()
+    keys = {provider: make_cache_key(prompt, provider, model, family, template=template) for provider in providers}
+    for provider in providers:
+        cached = cache.get(keys[provider])
+        if cached is not None:
+            _record_call(family, "hit", call_started)
+            yield cached
+            return
+    if not providers:
+        yield call_ai_api(prompt, model, family=family, template=template)
+        return
 
-def get_fallback_response(prompt: str):
-    """Return a fallback response when AI APIs are not available"""
-    if "analyze" in prompt.lower() and "solution" in prompt.lower():
+    flight_key = keys[providers[0]]
+    future, leader = _join_flight(flight_key)
+    if not leader:
+        print("⏳ Identical AI request already in flight, waiting for it")
+        try:
+            yield future.result()
+        except _FlightAbandoned:
+            yield call_ai_api(prompt, model, family=family, template=template)
+        return
+    outcome = {}
+    try:
+        yield from _stream_providers(prompt, model, family, template, keys, call_started, outcome)
+    finally:
+        if "text" in outcome:
+            _end_flight(flight_key, future, outcome["text"])
+        else:
+            _end_flight(flight_key, future, error=outcome.get("error") or _FlightAbandoned())
+
+def _stream_providers(prompt, model, family, template, keys, call_started, outcome):
+    """Leader side of stream_ai_api; stores the final text (or error) in outcome for waiting callers"""
+    cache = get_cache()
+    router = get_router()
+    order = router.order(list(keys))
+    try:
+        while order:
+            provider = order[0]
+            parts = []
+            queued = time.monotonic()
+            limiter = get_rate_limiter(provider)
+            prompt_tokens = estimate_tokens(prompt)
+            limiter.acquire(prompt_tokens)
+            limiter.concurrency.acquire()
+            started = time.monotonic()
+            rate_limited = False
+            try:
+                for delta in _stream_provider(provider, prompt, model, family):
+                    if not parts:
+                        get_metrics().observe("ai_ttfb_seconds", time.monotonic() - started, provider=provider,
+                                              model=_provider_settings(provider, model, family)[0])
+                    parts.append(delta)
+                    yield delta
+            except AIRateLimitError as e:
+                # The provider is healthy but busy: back off instead of tripping its circuit
+                rate_limited = True
+                order.pop(0)
+                limiter.pause(e.retry_after if e.retry_after is not None else backoff_delay(0))
+                router.release(provider)
+                _record_request(provider, model, family, "rate_limited", started - queued, time.monotonic() - started,
+                                prompt_tokens, estimate_tokens("".join(parts)))
+                if parts:
+                    print(f"❌ {provider} stream interrupted: {e}")
+                    outcome["error"] = _FlightAbandoned(str(e))
+                    return
+                print(f"⏳ {provider} stream rate limited: {e}")
+                continue
+            except Exception as e:
+                order.pop(0)
+                router.record_failure(provider)
+                _record_request(provider, model, family, "error", started - queued, time.monotonic() - started,
+                                prompt_tokens, estimate_tokens("".join(parts)))
+                if parts:
+                    # Already showed partial output; don't restart with a different answer
+                    print(f"❌ {provider} stream interrupted: {e}")
+                    outcome["error"] = _FlightAbandoned(str(e))
+                    return
+                print(f"❌ {provider} stream failed: {e}")
+                continue
+            finally:
+                limiter.concurrency.release(rate_limited=rate_limited)
+                completion_tokens = estimate_tokens("".join(parts))
+                limiter.record_completion(completion_tokens)
+                print(f"🔢 {provider} {family}: ~{prompt_tokens} prompt + ~{completion_tokens} completion tokens")
+            order.pop(0)
+            latency = time.monotonic() - started
+            router.record_success(provider, latency, _provider_settings(provider, model, family)[0])
+            _record_request(provider, model, family, "success", started - queued, latency, prompt_tokens, completion_tokens)
+            text = "".join(parts)
+            if text.strip():
+                cache.set(keys[provider], text, family)
+                _record_call(family, "miss", call_started)
+                print(f"✅ {provider} stream complete")
+                outcome["text"] = text
+                return
+    finally:
+        for provider in order:
+            # Half-open probe slots order() granted that this stream never used (or abandoned)
+            router.release(provider)
+
+    try:
+        text = _call_providers(prompt, model, 3, family, keys)
+        _record_call(family, "miss", call_started)
+    except Exception as e:
+        outcome["error"] = e
+        raise
+    outcome["text"] = text
+    yield text
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """Shared worker pool for concurrent AI calls"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=AI_MAX_CONCURRENCY, thread_name_prefix="ai-call")
+    return _executor
+
+_hedge_executor = None
+
+def _get_hedge_executor():
+    """Separate pool for provider requests, so calls running on the AI pool never wait on themselves"""
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=AI_MAX_CONCURRENCY * 2, thread_name_prefix="ai-request")
+    return _hedge_executor
+
+async def acall_ai_api(prompt: str, model: str = None, max_retries=3, family: str = "default", template: str = None):
+    """Awaitable call_ai_api; shares the same cache, retries and fallbacks.
+
+    The blocking HTTP work runs on the shared AI worker pool so the event
+    loop stays free and several prompts can be in flight at once.
+    """
+    loop = asyncio.get_running_loop()
+    call = functools.partial(call_ai_api, prompt, model=model, max_retries=max_retries, family=family,
+                             template=template)
+    return await loop.run_in_executor(_get_executor(), call)
+
+async def agather_ai(*requests_):
+    """Run several prompts concurrently; each item is a prompt string or a dict of acall_ai_api kwargs"""
+    calls = [acall_ai_api(r) if isinstance(r, str) else acall_ai_api(**r) for r in requests_]
+    return await asyncio.gather(*calls)
+
+def _batch_hash(prompts, model, family):
+    """Identity of a batch: the exact prompt list and where it is sent"""
+    return hashlib.sha256(json.dumps([model, family, prompts]).encode("utf-8")).hexdigest()
+
+def _load_checkpoint(path, batch_hash):
+    """Responses recorded in a batch checkpoint, by index; empty if it belongs to another batch.
+
+    The file is a header line naming the batch hash followed by one
+    {"index", "response"} line per finished prompt; a torn last line is ignored.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except OSError:
+        return {}
+    results = {}
+    for number, line in enumerate(lines):
+        try:
+            if not line.endswith("\n"):
+                raise ValueError("incomplete line")
+            record = json.loads(line)
+        except ValueError:
+            if number == 0:
+                return {}
+            continue
+        if number == 0:
+            if not isinstance(record, dict) or record.get("batch") != batch_hash:
+                return {}
+            continue
+        results[record["index"]] = record["response"]
+    return results
+
+def _is_fallback(response, prompt, model, family):
+    """Whether call_ai_api answered prompt with get_fallback_response instead of a model"""
+    return response == get_fallback_response(_enforce_budget(normalize_prompt(prompt), family, model), family)
+
+def call_ai_api_many(prompts, max_concurrency=None, model: str = None, family: str = "default", batch_id: str = None):
+    """Run many prompts through a bounded worker pool and yield (index, response) as each finishes.
+
+    Every call goes through call_ai_api, so the cache and the per-provider
+    rate limiters apply. When batch_id is given, each model answer is
+    checkpointed under AI_BATCH_CHECKPOINT_DIR; re-running the same prompt
+    list yields those from the checkpoint and only sends the rest (including
+    prompts that got a fallback response).
+    """
+    prompts = list(prompts)
+    max_concurrency = max_concurrency or AI_MAX_CONCURRENCY
+    checkpoint = None
+    done = {}
+    if batch_id:
+        Path(AI_BATCH_CHECKPOINT_DIR).mkdir(parents=True, exist_ok=True)
+        checkpoint_path = Path(AI_BATCH_CHECKPOINT_DIR) / f"{batch_id}.jsonl"
+        batch_hash = _batch_hash(prompts, model, family)
+        done = _load_checkpoint(checkpoint_path, batch_hash)
+        if done:
+            print(f"♻️ Resuming batch {batch_id}: {len(done)}/{len(prompts)} already done")
+        # Rewrite what is kept (dropping a torn tail or another batch's answers), then append
+        checkpoint = open(checkpoint_path, "w", encoding="utf-8")
+        checkpoint.write(json.dumps({"batch": batch_hash}) + "\n")
+        for index, response in sorted(done.items()):
+            checkpoint.write(json.dumps({"index": index, "response": response}) + "\n")
+        checkpoint.flush()
+
+    try:
+        for index, response in sorted(done.items()):
+            yield index, response
+        pending = {}
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ai-batch") as pool:
+            queue = (index for index in range(len(prompts)) if index not in done)
+            for index in queue:
+                pending[pool.submit(call_ai_api, prompts[index], model, family=family)] = index
+                if len(pending) >= max_concurrency:
+                    break
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index = pending.pop(future)
+                    response = future.result()
+                    # A fallback is not an answer; leave it for the next run to retry
+                    if checkpoint and not _is_fallback(response, prompts[index], model, family):
+                        checkpoint.write(json.dumps({"index": index, "response": response}) + "\n")
+                        checkpoint.flush()
+                    yield index, response
+                    next_index = next(queue, None)
+                    if next_index is not None:
+                        pending[pool.submit(call_ai_api, prompts[next_index], model, family=family)] = next_index
+    finally:
+        if checkpoint:
+            checkpoint.close()
+    if checkpoint:
+        print(f"✅ Batch {batch_id} complete ({len(prompts)} prompts)")
+
+def get_fallback_response(prompt: str, family: str = "default"):
+    """Return a fallback response when AI APIs are not available.
+
+    Only analysis prompts (and untemplated ones) get the analysis or
+    explanation placeholders; every other family gets the general answer.
+    """
+    keyword_match = family in ("analysis", "default")
+    if keyword_match and "analyze" in prompt.lower() and "solution" in prompt.lower():
         # Return a structured JSON response for solution analysis
         return json.dumps({
             "correct": False,
@@ -87,7 +871,7 @@ def get_fallback_response(prompt: str):
                 "What are common mistakes in this problem?;Mistake analysis pending - Set up API keys"
             ]
         })
-    elif "explain" in prompt.lower() and "code" in prompt.lower():
+    elif keyword_match and "explain" in prompt.lower() and "code" in prompt.lower():
         return """
 ## Code Explanation
 
@@ -124,53 +908,102 @@ For now, here are some general DSA resources:
 Try solving problems in the "Solve Problems" section to practice!
         """
 
-def call_groq_api(prompt: str, model: str = None):
-    """Call Groq API"""
-    if not GROQ_API_KEY:
-        print("❌ No Groq API key found")
-        return get_fallback_response(prompt)
-    
-    model = model or "llama3-70b-8192"
+class AIProviderError(Exception):
+    """A provider request failed or returned no usable content"""
+
+class AIRetryableError(AIProviderError):
+    """Transient failure (timeout, connection error, 5xx); worth retrying after a delay"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class AIRateLimitError(AIRetryableError):
+    """HTTP 429 from the provider"""
+
+class AIFatalError(AIProviderError):
+    """Request the provider will keep rejecting (bad key, bad model, malformed payload)"""
+
+class AIRequestCancelled(AIProviderError):
+    """A hedged request lost the race and was dropped"""
+
+PROVIDER_NAMES = {"groq": "Groq", "openrouter": "OpenRouter"}
+
+def _provider_endpoint(provider):
+    """(api_key, url) for a provider"""
+    if provider == "groq":
+        return GROQ_API_KEY, GROQ_API_URL
+    return OPENROUTER_API_KEY, OPENROUTER_API_URL
+
+def _check_status(provider, response):
+    """Classify a provider HTTP response, raising the matching AIProviderError"""
+    name = PROVIDER_NAMES[provider]
+    remaining = [response.headers.get(h) for h in ("x-ratelimit-remaining-requests", "x-ratelimit-remaining-tokens")]
+    if "0" in remaining:
+        # Quota exhausted by this request; hold the next one until the window resets
+        reset = parse_retry_after({k: v for k, v in response.headers.items() if k.lower().startswith("x-ratelimit-reset")})
+        if reset:
+            get_rate_limiter(provider).pause(reset)
+    status = response.status_code
+    if status < 400:
+        return
+    retry_after = parse_retry_after(response.headers)
+    if status == 429:
+        raise AIRateLimitError(f"{name} API rate limited (429)", retry_after=retry_after)
+    if status >= 500 or status == 408:
+        raise AIRetryableError(f"{name} API server error ({status})", retry_after=retry_after)
+    raise AIFatalError(f"{name} API rejected the request ({status}): {response.text[:200]}")
+
+def _request_completion(provider, prompt: str, model: str = None, family: str = "default"):
+    """Send one chat completion request; raise AIProviderError instead of returning fallback text"""
+    api_key, url = _provider_endpoint(provider)
+    name = PROVIDER_NAMES[provider]
+    model, params = _provider_settings(provider, model, family)
     headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
     payload = {
         "messages": [{"role": "user", "content": prompt}],
         "model": model,
-        "temperature": 0.3,
-        "max_tokens": 4000
+        **params
     }
     
     try:
-        print(f"📡 Calling Groq API with model: {model}")
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
+        print(f"📡 Calling {name} API with model: {model}")
+        response = get_http_session().post(
+            url,
             headers=headers,
             json=payload,
-            timeout=120
+            timeout=_timeouts(family)
         )
-        response.raise_for_status()
+        get_metrics().observe("ai_ttfb_seconds", response.elapsed.total_seconds(), provider=provider, model=model)
+        _check_status(provider, response)
         result = response.json()
-        if "choices" in result and len(result["choices"]) > 0:
-            content = result["choices"][0]["message"]["content"]
-            if content and content.strip():
-                print("✅ Groq API call successful")
-                return content
-            else:
-                print("⚠️ Groq API returned empty content")
-                return get_fallback_response(prompt)
-        else:
-            print("⚠️ Groq API response missing choices")
-            return get_fallback_response(prompt)
+    except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+        raise AIRetryableError(f"{name} API request failed: {e}") from e
     except requests.exceptions.RequestException as e:
-        print(f"❌ Groq API request failed: {e}")
-        return get_fallback_response(prompt)
-    except json.JSONDecodeError as e:
-        print(f"❌ Groq API response not valid JSON: {e}")
+        raise AIProviderError(f"{name} API request failed: {e}") from e
+    except ValueError as e:
+        raise AIRetryableError(f"{name} API response not valid JSON: {e}") from e
+    
+    if not result.get("choices"):
+        raise AIProviderError(f"{name} API response missing choices")
+    content = result["choices"][0].get("message", {}).get("content")
+    if not content or not content.strip():
+        raise AIProviderError(f"{name} API returned empty content")
+    print(f"✅ {name} API call successful")
+    return content
+
+def call_groq_api(prompt: str, model: str = None):
+    """Call Groq API"""
+    if not GROQ_API_KEY:
+        print("❌ No Groq API key found")
         return get_fallback_response(prompt)
-    except Exception as e:
-        print(f"❌ Groq API unexpected error: {e}")
+    try:
+        return _request_completion("groq", prompt, model)
+    except AIProviderError as e:
+        print(f"❌ {e}")
         return get_fallback_response(prompt)
 
 def call_openrouter_api(prompt: str, model: str = None):
@@ -178,44 +1011,8 @@ def call_openrouter_api(prompt: str, model: str = None):
     if not OPENROUTER_API_KEY:
         print("❌ No OpenRouter API key found")
         return get_fallback_response(prompt)
-    
-    model = model or "mistralai/mixtral-8x7b-instruct"
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "messages": [{"role": "user", "content": prompt}],
-        "model": model
-    }
-    
     try:
-        print(f"📡 Calling OpenRouter API with model: {model}")
-        response = requests.post(
-            "https://api.openrouter.ai/v1/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=120
-        )
-        response.raise_for_status()
-        result = response.json()
-        if "choices" in result and len(result["choices"]) > 0:
-            content = result["choices"][0]["message"]["content"]
-            if content and content.strip():
-                print("✅ OpenRouter API call successful")
-                return content
-            else:
-                print("⚠️ OpenRouter API returned empty content")
-                return get_fallback_response(prompt)
-        else:
-            print("⚠️ OpenRouter API response missing choices")
-            return get_fallback_response(prompt)
-    except requests.exceptions.RequestException as e:
-        print(f"❌ OpenRouter API request failed: {e}")
-        return get_fallback_response(prompt)
-    except json.JSONDecodeError as e:
-        print(f"❌ OpenRouter API response not valid JSON: {e}")
-        return get_fallback_response(prompt)
-    except Exception as e:
-        print(f"❌ OpenRouter API unexpected error: {e}")
+        return _request_completion("openrouter", prompt, model)
+    except AIProviderError as e:
+        print(f"❌ {e}")
         return get_fallback_response(prompt)
@@ -0,0 +1,207 @@
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from config import AI_RATE_LIMITS, AI_MAX_CONCURRENCY, AI_BACKOFF_BASE, AI_BACKOFF_CAP
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    A capacity of 0 disables the limit. Charges may push the level below
+    zero (e.g. completion tokens known only after the response); later
+    acquirers then wait until the debt is repaid.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until amount is available, then take it; returns seconds waited"""
+        if not self.capacity:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return waited
+                delay = (amount - self.level) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def charge(self, amount):
+        """Take amount without waiting (may go negative)"""
+        if not self.capacity:
+            return
+        with self._lock:
+            self._refill()
+            self.level -= amount
+
+
+class AIMDLimiter:
+    """Adaptive cap on concurrent requests (additive increase, multiplicative decrease).
+
+    Each success raises the limit by 1/limit, so it grows by about one per
+    window of successful requests; a rate-limit response halves it.
+    """
+
+    def __init__(self, max_limit, min_limit=1):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, rate_limited=False):
+        with self._cond:
+            self.in_flight -= 1
+            if rate_limited:
+                self.limit = max(self.min_limit, self.limit / 2)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class ProviderRateLimiter:
+    """Request-per-minute and token-per-minute buckets plus an adaptive
+    concurrency cap for one provider"""
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, max_concurrency=AI_MAX_CONCURRENCY):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = AIMDLimiter(max_concurrency)
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, prompt_tokens):
+        """Wait out any provider-imposed pause, then for a request slot and the
+        prompt's token budget; returns seconds waited"""
+        with self._lock:
+            pause = self.blocked_until - time.monotonic()
+        waited = 0.0
+        if pause > 0:
+            time.sleep(pause)
+            waited += pause
+        return waited + self.requests.acquire(1) + self.tokens.acquire(prompt_tokens)
+
+    def headroom(self):
+        """Fraction of the request and token budgets currently free (0 while paused
+        or at the concurrency cap); background work waits for enough of it"""
+        with self._lock:
+            if self.blocked_until > time.monotonic():
+                return 0.0
+        if self.concurrency.in_flight >= int(self.concurrency.limit):
+            return 0.0
+        free = []
+        for bucket in (self.requests, self.tokens):
+            if bucket.capacity:
+                with bucket._lock:
+                    bucket._refill()
+                    free.append(max(0.0, bucket.level) / bucket.capacity)
+        return min(free) if free else 1.0
+
+    def record_completion(self, completion_tokens):
+        self.tokens.charge(completion_tokens)
+
+    def pause(self, seconds):
+        """Hold new requests for seconds (from Retry-After or rate-limit reset headers).
+
+        Capped at AI_BACKOFF_CAP so a long reset window never blocks the UI
+        thread for minutes; a request sent too early just gets another 429.
+        """
+        seconds = min(seconds, AI_BACKOFF_CAP)
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def _parse_duration(value):
+    """Parse '7.66s', '2m59.56s', '120ms' or a bare number of seconds"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers):
+    """Seconds the provider asked us to wait, from Retry-After or x-ratelimit-reset-* headers.
+
+    Header names are matched case-insensitively, whatever mapping is passed.
+    """
+    headers = {str(name).lower(): value for name, value in headers.items()}
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        seconds = _parse_duration(retry_after)
+        if seconds is None:
+            try:
+                seconds = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                seconds = None
+        if seconds is not None:
+            return max(0.0, seconds)
+    resets = []
+    for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens", "x-ratelimit-reset"):
+        value = headers.get(name)
+        if value:
+            seconds = _parse_duration(value)
+            if seconds is not None and seconds > 1e9:
+                seconds = seconds / 1000 - time.time() if seconds > 1e12 else seconds - time.time()  # epoch ms / s
+            if seconds is not None:
+                resets.append(max(0.0, seconds))
+    return max(resets) if resets else None
+
+
+def backoff_delay(attempt, retry_after=None, base=AI_BACKOFF_BASE, cap=AI_BACKOFF_CAP):
+    """Jittered exponential backoff for retry number attempt (0-based).
+
+    A provider-supplied retry_after is honoured as the floor (up to cap),
+    with a little jitter on top so parallel workers don't all retry at the
+    same instant.
+    """
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = min(retry_after, cap) + random.uniform(0, base)
+    return delay
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider):
+    """Process-wide limiter for provider, configured from AI_RATE_LIMITS"""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limits = AI_RATE_LIMITS.get(provider, {})
+            limiter = ProviderRateLimiter(limits.get("rpm", 0), limits.get("tpm", 0))
+            _limiters[provider] = limiter
+        return limiter
@@ -0,0 +1,195 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import AI_METRICS_PORT
+
+# Upper bounds of the histogram buckets (Prometheus "le"); +Inf is implicit
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+RETRY_BUCKETS = (0, 1, 2, 3, 5)
+
+HISTOGRAMS = {
+    "ai_call_seconds": ("End-to-end call_ai_api/stream_ai_api latency", SECONDS_BUCKETS),
+    "ai_queue_wait_seconds": ("Time spent waiting on rate limits and the concurrency cap", SECONDS_BUCKETS),
+    "ai_ttfb_seconds": ("Time from sending a provider request to its first byte", SECONDS_BUCKETS),
+    "ai_request_seconds": ("Provider request latency", SECONDS_BUCKETS),
+    "ai_prompt_tokens": ("Estimated prompt tokens per provider request", TOKEN_BUCKETS),
+    "ai_completion_tokens": ("Estimated completion tokens per provider request", TOKEN_BUCKETS),
+    "ai_retries": ("Retries needed per uncached call", RETRY_BUCKETS),
+}
+COUNTERS = {
+    "ai_calls_total": "AI calls by family and cache result",
+    "ai_requests_total": "Provider requests by outcome",
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram with sum and count"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate the q-quantile (0-1) by interpolating within its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                low = self.buckets[i - 1] if i > 0 else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return low + (high - low) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class AIMetrics:
+    """Thread-safe registry of the AI client's counters and histograms.
+
+    Series are keyed by metric name plus a sorted label tuple, e.g.
+    ("ai_request_seconds", (("model", "llama3-70b-8192"), ("provider", "groq"))).
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(HISTOGRAMS[name][1])
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self):
+        """All series in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, help_text in COUNTERS.items():
+                series = [(labels, v) for (n, labels), v in sorted(self._counters.items()) if n == name]
+                if not series:
+                    continue
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f"{name}{_label_text(labels)} {value}" for labels, value in series]
+            for name, (help_text, buckets) in HISTOGRAMS.items():
+                series = [(labels, h) for (n, labels), h in sorted(self._histograms.items()) if n == name]
+                if not series:
+                    continue
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for labels, histogram in series:
+                    cumulative = 0
+                    for bound, count in zip(list(buckets) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_sum{_label_text(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{_label_text(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def counter_total(self, name, **match):
+        """Sum of a counter over all series whose labels include match"""
+        with self._lock:
+            return sum(v for (n, labels), v in self._counters.items()
+                       if n == name and all(dict(labels).get(k) == m for k, m in match.items()))
+
+    def summary(self, name, group_by):
+        """Per-group count, mean and p50/p95/p99 of a histogram, merging the other labels"""
+        merged = {}
+        with self._lock:
+            for (n, labels), histogram in self._histograms.items():
+                if n != name:
+                    continue
+                group = dict(labels).get(group_by, "")
+                target = merged.get(group)
+                if target is None:
+                    target = merged[group] = Histogram(histogram.buckets)
+                target.counts = [a + b for a, b in zip(target.counts, histogram.counts)]
+                target.sum += histogram.sum
+                target.count += histogram.count
+        return {
+            group: {
+                "count": h.count,
+                "mean": h.sum / h.count if h.count else None,
+                "p50": h.quantile(0.5),
+                "p95": h.quantile(0.95),
+                "p99": h.quantile(0.99),
+            }
+            for group, h in sorted(merged.items())
+        }
+
+
+_metrics = AIMetrics()
+
+
+def get_metrics():
+    """Process-wide AI metrics registry"""
+    return _metrics
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = get_metrics().render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=AI_METRICS_PORT, host="127.0.0.1"):
+    """Serve /metrics for Prometheus on a background thread (once per process; port 0 = off)"""
+    global _server
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                print(f"⚠️ Metrics endpoint not started on port {port}: {e}")
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="ai-metrics", daemon=True).start()
+            print(f"📈 AI metrics at http://{host}:{port}/metrics")
+        return _server
@@ -0,0 +1,87 @@
+import hashlib
+import queue
+import threading
+import time
+
+from config import AI_PREFETCH_HEADROOM
+from ai_client import call_ai_api, is_cached, _available_providers
+from ai_limits import get_rate_limiter
+
+
+class Prefetcher:
+    """Warms the AI cache in the background, one request at a time.
+
+    Jobs run on a single daemon thread and only while some provider has at
+    least AI_PREFETCH_HEADROOM of its rate limits free, so interactive
+    requests keep priority. Prompts already cached, queued or running are
+    skipped; a user request for a prompt that is being prefetched joins the
+    in-flight call instead of sending a second one.
+    """
+
+    def __init__(self, headroom=AI_PREFETCH_HEADROOM, poll_interval=1.0):
+        self.headroom = headroom
+        self.poll_interval = poll_interval
+        self._queue = queue.Queue()
+        self._seen = set()  # job ids queued or running
+        self._lock = threading.Lock()
+        self._thread = None
+        self.completed = 0
+        self.skipped = 0
+
+    def submit(self, prompt, family="default", template=None):
+        """Queue prompt for prefetching; returns False if it is already queued or running.
+
+        template is the prompt template fingerprint, as passed to call_ai_api.
+        """
+        job_id = hashlib.sha256(f"{family}\0{template}\0{prompt}".encode("utf-8")).hexdigest()
+        with self._lock:
+            if job_id in self._seen:
+                return False
+            self._seen.add(job_id)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ai-prefetch", daemon=True)
+                self._thread.start()
+        self._queue.put((job_id, prompt, family, template))
+        return True
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _wait_for_headroom(self):
+        while True:
+            providers = _available_providers()
+            if any(get_rate_limiter(p).headroom() >= self.headroom for p in providers):
+                return
+            time.sleep(self.poll_interval)
+
+    def _run(self):
+        while True:
+            job_id, prompt, family, template = self._queue.get()
+            try:
+                if not _available_providers() or is_cached(prompt, family=family, template=template):
+                    self.skipped += 1
+                    continue
+                self._wait_for_headroom()
+                call_ai_api(prompt, family=family, max_retries=1, template=template)
+                self.completed += 1
+                print(f"🔮 Prefetched {family} response ({self.pending()} queued)")
+            except Exception as e:
+                print(f"❌ Prefetch failed: {e}")
+            finally:
+                # Done with it; a later submit (e.g. after the cache entry expired) may queue it again
+                with self._lock:
+                    self._seen.discard(job_id)
+                self._queue.task_done()
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher():
+    """Process-wide prefetcher"""
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher()
+        return _prefetcher
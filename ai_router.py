@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import deque
+
+from config import (
+    AI_BREAKER_FAILURES, AI_BREAKER_COOLDOWN, AI_HEDGE_DEFAULT_DELAY,
+    AI_HEDGE_MIN_DELAY, AI_HEDGE_MULTIPLIER,
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderHealth:
+    """Recent latencies (per model) and circuit-breaker state for one provider"""
+
+    def __init__(self):
+        # Families run different models on one provider, so each model gets its own distribution
+        self.latencies = {}
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def record_latency(self, model, latency):
+        self.latencies.setdefault(model, deque(maxlen=100)).append(latency)
+
+    def p95(self, model=None):
+        samples = self.latencies.get(model, ())
+        if len(samples) < 5:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class ProviderRouter:
+    """Orders providers by health and decides when to hedge a slow request.
+
+    A provider's circuit opens after AI_BREAKER_FAILURES consecutive
+    failures and stays open for AI_BREAKER_COOLDOWN seconds; after that a
+    single probe request is let through (half-open) and its outcome closes
+    or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=AI_BREAKER_FAILURES, cooldown=AI_BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def _get(self, provider):
+        health = self._health.get(provider)
+        if health is None:
+            health = self._health[provider] = ProviderHealth()
+        return health
+
+    def _allow(self, health):
+        if health.state == CLOSED:
+            return True
+        if health.state == OPEN and time.monotonic() - health.opened_at >= self.cooldown:
+            health.state = HALF_OPEN
+        if health.state == HALF_OPEN and not health.probe_in_flight:
+            health.probe_in_flight = True
+            return True
+        return False
+
+    def order(self, providers):
+        """Providers whose circuit allows a request, in preference order.
+
+        If every circuit is open the full list is returned, so a total
+        outage still degrades to plain retries instead of refusing work.
+        """
+        with self._lock:
+            allowed = [p for p in providers if self._allow(self._get(p))]
+        return allowed or list(providers)
+
+    def release(self, provider):
+        """Give back a half-open probe slot that order() granted but was never used"""
+        with self._lock:
+            self._get(provider).probe_in_flight = False
+
+    def record_success(self, provider, latency, model=None):
+        with self._lock:
+            health = self._get(provider)
+            health.record_latency(model, latency)
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.probe_in_flight = False
+            if health.state != CLOSED:
+                print(f"✅ {provider} circuit closed")
+            health.state = CLOSED
+
+    def record_failure(self, provider):
+        with self._lock:
+            health = self._get(provider)
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.probe_in_flight = False
+            if health.state == HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                if health.state != OPEN:
+                    print(f"🔌 {provider} circuit opened after {health.consecutive_failures} failures")
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+
+    def hedge_delay(self, provider, model=None):
+        """Seconds to wait on provider's model before sending a hedged request elsewhere"""
+        with self._lock:
+            p95 = self._get(provider).p95(model)
+        if p95 is None:
+            return AI_HEDGE_DEFAULT_DELAY
+        return max(AI_HEDGE_MIN_DELAY, p95 * AI_HEDGE_MULTIPLIER)
+
+    def snapshot(self):
+        """Per-provider health summary"""
+        with self._lock:
+            return {
+                provider: {
+                    "state": health.state,
+                    "successes": health.successes,
+                    "failures": health.failures,
+                    "consecutive_failures": health.consecutive_failures,
+                    "p95_latency": {model: health.p95(model) for model in health.latencies},
+                }
+                for provider, health in self._health.items()
+            }
+
+
+_router = ProviderRouter()
+
+
+def get_router():
+    """Process-wide provider router"""
+    return _router
@@ -1,9 +1,11 @@
 import requests
 import csv
+import io
 import os
 from datetime import datetime
 from pathlib import Path
 from config import ANKI_DECK_NAME, ANKI_MODEL_NAME
+from ai_client import call_template
 import os
 
 ANKI_CONNECT_URL = os.getenv("ANKI_CONNECT_URL", "http://localhost:8765")
@@ -175,57 +177,16 @@ For automatic integration, install AnkiConnect addon:
     return instructions
 
 def generate_flashcards(problem, solution_code, analysis):
-    """Generate Anki flashcards for a DSA problem"""
-    prompt = f"""As a DSA expert, create comprehensive Anki flashcards for this problem:
-
-PROBLEM: {problem['title']}
-PATTERN: {problem.get('pattern', 'Unknown')}
-URL: {problem['url']}
-
-CODE:
-```
-{solution_code}
-```
-
-ANALYSIS:
-{analysis}
-
-Create flashcards in these categories:
-
-1. PROBLEM UNDERSTANDING
-- Problem statement → Key requirements and constraints
-- Input/Output → Example with explanation
-- Edge Cases → Important cases to handle
-
-2. SOLUTION APPROACH
-- Problem Pattern → Why this pattern fits
-- Solution Strategy → Step-by-step approach
-- Algorithm Steps → Key steps with explanation
-
-3. IMPLEMENTATION
-- Code Structure → Key components needed
-- Critical Steps → Important implementation details
-- Edge Case Handling → How to handle special cases
-
-4. COMPLEXITY
-- Time Complexity → Explanation with breakdown
-- Space Complexity → Explanation with breakdown
-- Optimization → Possible improvements
-
-5. PATTERN APPLICATION
-- Pattern Recognition → How to identify this pattern
-- Similar Problems → Related problems using same pattern
-- Variations → Common variations of this pattern
-
-Format each flashcard as:
-Front: Clear, concise question
-Back: Detailed explanation with:
-- Main points
-- Examples if helpful
-- Code snippets if relevant
-- Visual hints if applicable
-
-Return in CSV format:
-"Front","Back"
-Make cards focused but comprehensive."""
-    return call_ai_api(prompt)
+    """Generate Anki flashcards for a DSA problem as "Question;Answer" strings (see create_flashcards)"""
+    answer = call_template("flashcards", code_sections={"solution_code": solution_code}, text_sections={"analysis": analysis},
+                           title=problem['title'], pattern=problem.get('pattern', 'Unknown'), url=problem['url'])
+    # The template asks for CSV under a "Front","Back" header; anything else in the answer is ignored
+    cards = []
+    header_seen = False
+    for row in csv.reader(io.StringIO(answer)):
+        fields = [field.strip() for field in row]
+        if fields == ["Front", "Back"]:
+            header_seen = True
+        elif header_seen and len(fields) == 2 and all(fields):
+            cards.append(f"{fields[0]};{fields[1]}")
+    return cards
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+DSA Mastery System - AI Client Benchmark
+Drives call_ai_api (or stream_ai_api) against the local mock provider at
+several concurrency levels and reports throughput, latency percentiles and
+cache hit rate. No real API quota is used: both providers are pointed at the
+mock and given placeholder keys.
+
+Example:
+    python benchmark_ai.py --concurrency 1,4,8,16 --requests 200 --repeat 0.3
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mock_ai_server
+
+
+def percentile(values, q):
+    """q-th percentile (0-100) by linear interpolation"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def configure_environment(args, url):
+    """Point ai_client at the mock before it (and config) are imported"""
+    os.environ["USE_GROQ"] = "true"
+    os.environ["GROQ_API_KEY"] = "mock-key" if "groq" in args.providers else ""
+    os.environ["OPENROUTER_API_KEY"] = "mock-key" if "openrouter" in args.providers else ""
+    os.environ["GROQ_API_URL"] = url
+    os.environ["OPENROUTER_API_URL"] = url
+    os.environ["AI_CACHE_DB"] = os.path.join(tempfile.mkdtemp(prefix="ai_bench_"), "ai_cache.db")
+    if not args.keep_limits:
+        for name in ("GROQ_RPM", "GROQ_TPM", "OPENROUTER_RPM", "OPENROUTER_TPM"):
+            os.environ[name] = "0"
+
+
+def build_prompts(level, count, repeat, rng):
+    """count prompts where roughly a repeat share re-asks an earlier prompt of this level"""
+    prompts = []
+    for i in range(count):
+        if prompts and rng.random() < repeat:
+            prompts.append(rng.choice(prompts))
+        else:
+            prompts.append(f"Benchmark level {level} request {i}: explain the sliding window pattern.")
+    return prompts
+
+
+def server_counts(server, url):
+    if server is not None:
+        with server.RequestHandlerClass.settings.lock:
+            return dict(server.RequestHandlerClass.settings.counts)
+    import requests
+    try:
+        return requests.get(url.split("/v1/")[0] + "/stats", timeout=5).json()
+    except Exception:
+        return {}
+
+
+def run_level(ai_client, level, prompts, family, stream):
+    """Issue prompts with level-way concurrency; returns (latencies, first-byte times, wall seconds)"""
+    def one(prompt):
+        started = time.perf_counter()
+        first_byte = None
+        if stream:
+            for _ in ai_client.stream_ai_api(prompt, family=family):
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+        else:
+            ai_client.call_ai_api(prompt, family=family)
+        return time.perf_counter() - started, first_byte
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=level) as pool:
+        results = list(pool.map(one, prompts))
+    wall = time.perf_counter() - started
+    return [r[0] for r in results], [r[1] for r in results if r[1] is not None], wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-benchmark ai_client against the mock AI provider")
+    parser.add_argument("--concurrency", default="1,4,8,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--repeat", type=float, default=0.3, help="share of requests repeating an earlier prompt")
+    parser.add_argument("--family", default="default", help="prompt family (selects profile and cache TTL)")
+    parser.add_argument("--providers", default="groq,openrouter", help="providers to enable")
+    parser.add_argument("--stream", action="store_true", help="use stream_ai_api and report time to first byte")
+    parser.add_argument("--keep-limits", action="store_true", help="keep the configured provider rate limits")
+    parser.add_argument("--url", help="use an already running mock at this chat-completions URL")
+    parser.add_argument("--port", type=int, default=0, help="port for the built-in mock (0 = any free port)")
+    parser.add_argument("--output", help="also write the results as JSON to this file")
+    mock_ai_server.add_arguments(parser)
+    args = parser.parse_args()
+    args.providers = [p.strip() for p in args.providers.split(",") if p.strip()]
+
+    server = None
+    url = args.url
+    if not url:
+        server = mock_ai_server.start_server(mock_ai_server.settings_from_args(args), port=args.port)
+        url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    configure_environment(args, url)
+    import ai_client
+
+    rng = random.Random(args.seed)
+    results = []
+    print(f"🧪 Benchmarking ai_client against {url} ({', '.join(args.providers)})")
+    print(f"{'conc':>5} {'reqs':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'ttfb50':>8} {'hit%':>6} {'upstream':>9}")
+    for level in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        prompts = build_prompts(level, args.requests, args.repeat, rng)
+        cache_before = ai_client.get_cache_stats()
+        upstream_before = server_counts(server, url).get("requests", 0)
+        latencies, first_bytes, wall = run_level(ai_client, level, prompts, args.family, args.stream)
+        cache_after = ai_client.get_cache_stats()
+        hits = sum(cache_after[k] - cache_before[k] for k in ("memory_hits", "disk_hits"))
+        row = {
+            "concurrency": level,
+            "requests": len(prompts),
+            "throughput_rps": len(prompts) / wall if wall else 0.0,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "ttfb_p50": percentile(first_bytes, 50) if first_bytes else None,
+            "hit_rate": hits / len(prompts) if prompts else 0.0,
+            "upstream_requests": server_counts(server, url).get("requests", 0) - upstream_before,
+        }
+        results.append(row)
+        ttfb = f"{row['ttfb_p50']:.3f}" if row["ttfb_p50"] is not None else "-"
+        print(f"{level:>5} {row['requests']:>5} {row['throughput_rps']:>8.2f} {row['p50']:>8.3f} "
+              f"{row['p95']:>8.3f} {row['p99']:>8.3f} {ttfb:>8} {100 * row['hit_rate']:>5.1f}% "
+              f"{row['upstream_requests']:>9}")
+
+    if server is not None:
+        print(f"📊 Mock provider totals: {server_counts(server, url)}")
+        server.shutdown()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import json
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -9,11 +10,131 @@ load_dotenv()
 USE_GROQ = os.getenv("USE_GROQ", "true").lower() == "true"  # Default to Groq
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "")
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL", "https://api.openrouter.ai/v1/chat/completions")
+
+# AI HTTP transport (connections are pooled and kept alive across calls)
+AI_HTTP_POOL_CONNECTIONS = int(os.getenv("AI_HTTP_POOL_CONNECTIONS", "4"))  # number of hosts kept pooled
+AI_HTTP_POOL_MAXSIZE = int(os.getenv("AI_HTTP_POOL_MAXSIZE", "8"))  # max open connections per host
+AI_CONNECT_TIMEOUT = float(os.getenv("AI_CONNECT_TIMEOUT", "5"))
+AI_READ_TIMEOUT = float(os.getenv("AI_READ_TIMEOUT", "120"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))  # worker threads for concurrent AI calls
+# Per-provider quotas: requests and tokens per minute (0 = unlimited)
+AI_RATE_LIMITS = {
+    "groq": {
+        "rpm": int(os.getenv("GROQ_RPM", "30")),
+        "tpm": int(os.getenv("GROQ_TPM", "6000")),
+    },
+    "openrouter": {
+        "rpm": int(os.getenv("OPENROUTER_RPM", "20")),
+        "tpm": int(os.getenv("OPENROUTER_TPM", "0")),
+    },
+}
+# Provider routing: circuit breakers and hedged requests
+AI_BREAKER_FAILURES = int(os.getenv("AI_BREAKER_FAILURES", "3"))  # consecutive failures before a circuit opens
+AI_BREAKER_COOLDOWN = float(os.getenv("AI_BREAKER_COOLDOWN", "30"))  # seconds before a half-open probe
+AI_HEDGE_MULTIPLIER = float(os.getenv("AI_HEDGE_MULTIPLIER", "1.0"))  # hedge after p95 latency x this
+AI_HEDGE_MIN_DELAY = float(os.getenv("AI_HEDGE_MIN_DELAY", "2"))
+AI_HEDGE_DEFAULT_DELAY = float(os.getenv("AI_HEDGE_DEFAULT_DELAY", "15"))  # until enough latency samples exist
+AI_BACKOFF_BASE = float(os.getenv("AI_BACKOFF_BASE", "1"))  # seconds, doubled per retry
+AI_BACKOFF_CAP = float(os.getenv("AI_BACKOFF_CAP", "30"))
+# Task routing: model per provider plus sampling and timeout for each prompt family.
+# Short classification/chat tasks go to small, fast models; notes to the large ones.
+# Override any part with a JSON file of the same shape via AI_TASK_PROFILES_FILE.
+AI_TASK_PROFILES = {
+    "default": {
+        "models": {"groq": "llama3-70b-8192", "openrouter": "mistralai/mixtral-8x7b-instruct"},
+        "max_tokens": 4000, "temperature": 0.3, "timeout": AI_READ_TIMEOUT,
+    },
+    "pattern": {
+        "models": {"groq": "llama-3.1-8b-instant", "openrouter": "mistralai/mistral-7b-instruct"},
+        "max_tokens": 20, "temperature": 0.0, "timeout": 15,
+    },
+    "chat": {
+        "models": {"groq": "llama-3.1-8b-instant", "openrouter": "mistralai/mistral-7b-instruct"},
+        "max_tokens": 400, "temperature": 0.3, "timeout": 30,
+    },
+    "solution": {"max_tokens": 1500, "temperature": 0.2, "timeout": 60},
+    # Structured analyses carry fixed_code and annotated_code, so they need notes-sized room
+    "analysis": {"max_tokens": 4000, "temperature": 0.2, "timeout": 120},
+    "flashcards": {"max_tokens": 2000, "temperature": 0.3, "timeout": 90},
+    "notes": {"max_tokens": 4000, "temperature": 0.3, "timeout": 120},
+    # Notes + analysis (with fixed/annotated code) + flashcards as JSON need far more
+    # completion room than notes alone, so bundles go to long-context models
+    "bundle": {
+        "models": {"groq": "llama-3.3-70b-versatile", "openrouter": "mistralai/mixtral-8x7b-instruct"},
+        "max_tokens": 10000, "temperature": 0.3, "timeout": 240,
+    },
+}
+_task_profiles_file = os.getenv("AI_TASK_PROFILES_FILE", "")
+if _task_profiles_file and os.path.exists(_task_profiles_file):
+    with open(_task_profiles_file, "r", encoding="utf-8") as _f:
+        for _task, _overrides in json.load(_f).items():
+            _profile = AI_TASK_PROFILES.setdefault(_task, {})
+            _profile.update({k: v for k, v in _overrides.items() if k != "models"})
+            _profile.setdefault("models", {}).update(_overrides.get("models", {}))
+AI_BATCH_CHECKPOINT_DIR = os.getenv("AI_BATCH_CHECKPOINT_DIR", "ai_batches")
+# Prometheus text endpoint for AI client metrics (0 = off; the dashboard panel works either way)
+AI_METRICS_PORT = int(os.getenv("AI_METRICS_PORT", "0"))
+# Background prefetch of notes and solutions for the next unsolved problems (opt-in)
+AI_PREFETCH_ENABLED = os.getenv("AI_PREFETCH_ENABLED", "false").lower() == "true"
+AI_PREFETCH_COUNT = int(os.getenv("AI_PREFETCH_COUNT", "3"))
+AI_PREFETCH_LANGUAGES = [l.strip() for l in os.getenv("AI_PREFETCH_LANGUAGES", "java").split(",") if l.strip()]
+AI_PREFETCH_HEADROOM = float(os.getenv("AI_PREFETCH_HEADROOM", "0.5"))  # free share of rate limits to keep for the user
+# Context window per model in tokens; a prompt may use what is left after the
+# family's max_tokens, less AI_PROMPT_SAFETY_MARGIN for estimator error.
+# A profile can also cap its prompts with "max_prompt_tokens".
+AI_MODEL_CONTEXT_WINDOWS = {
+    "llama3-70b-8192": 8192,
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.3-70b-versatile": 131072,
+    "mistralai/mixtral-8x7b-instruct": 32768,
+    "mistralai/mistral-7b-instruct": 32768,
+}
+AI_DEFAULT_CONTEXT_WINDOW = int(os.getenv("AI_DEFAULT_CONTEXT_WINDOW", "8192"))
+AI_PROMPT_SAFETY_MARGIN = float(os.getenv("AI_PROMPT_SAFETY_MARGIN", "0.1"))
 
 # Paths
 OBSIDIAN_VAULT = os.getenv("OBSIDIAN_VAULT", str(Path.home() / "Documents" / "Obsidian" / "DSA"))
 NEETCODE_FILE = "neetcode_150.json"
 PROGRESS_FILE = "progress.json"
+# Changes to the two files above are written behind, this many seconds after the last one
+PERSIST_DEBOUNCE_SECONDS = float(os.getenv("PERSIST_DEBOUNCE_SECONDS", "2"))
+# Progress changes are appended here and folded into PROGRESS_FILE every
+# PROGRESS_JOURNAL_COMPACT_RECORDS records (and at shutdown)
+PROGRESS_JOURNAL_FILE = os.getenv("PROGRESS_JOURNAL_FILE", "progress.journal")
+PROGRESS_JOURNAL_FSYNC_SECONDS = float(os.getenv("PROGRESS_JOURNAL_FSYNC_SECONDS", "1"))
+PROGRESS_JOURNAL_FSYNC_BATCH = int(os.getenv("PROGRESS_JOURNAL_FSYNC_BATCH", "16"))
+PROGRESS_JOURNAL_COMPACT_RECORDS = int(os.getenv("PROGRESS_JOURNAL_COMPACT_RECORDS", "200"))
+# Where problems and progress live: "json" (the files above) or "sqlite" (STORAGE_DB,
+# one list per PROBLEM_LIST). A new sqlite list imports its problems once from
+# PROBLEM_LIST_FILE (starting empty if there is none); only the list in
+# NEETCODE_FILE also imports PROGRESS_FILE and its journal.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+STORAGE_DB = os.getenv("STORAGE_DB", "dsa_progress.db")
+PROBLEM_LIST = os.getenv("PROBLEM_LIST", "neetcode_150")
+PROBLEM_LIST_FILE = os.getenv("PROBLEM_LIST_FILE", f"{PROBLEM_LIST}.json")
+
+# AI response cache
+AI_CACHE_DB = os.getenv("AI_CACHE_DB", "ai_cache.db")
+AI_CACHE_LEGACY_FILE = "ai_cache.json"  # imported once into AI_CACHE_DB
+AI_CACHE_MEMORY_BYTES = int(os.getenv("AI_CACHE_MEMORY_BYTES", str(16 * 1024 * 1024)))
+AI_CACHE_DISK_BYTES = int(os.getenv("AI_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+# Time-to-live per prompt family, in seconds (None = never expires)
+_DAY = 24 * 60 * 60
+AI_CACHE_TTLS = {
+    "notes": 180 * _DAY,
+    "bundle": 180 * _DAY,
+    "solution": 90 * _DAY,
+    "analysis": 30 * _DAY,
+    "pattern": 365 * _DAY,
+    "flashcards": 180 * _DAY,
+    "chat": _DAY,
+    "default": 30 * _DAY,
+}
+
+# Local pattern classifier: below this confidence auto_detect_pattern asks the LLM
+PATTERN_CLASSIFIER_THRESHOLD = float(os.getenv("PATTERN_CLASSIFIER_THRESHOLD", "0.8"))
 
 # Study Configuration
 DAILY_GOAL = 3
@@ -1,12 +1,21 @@
 import os
+import atexit
+import copy
 import json
 import random
 import re
+import threading
+import weakref
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
 from config import *
-from ai_client import call_ai_api
-from anki_manager import create_flashcards
+from ai_client import call_template, render_template
+from anki_manager import create_flashcards, generate_flashcards
+from pattern_classifier import PatternClassifier, canonical_pattern
+from problem_catalog import ProblemCatalog
+from progress_journal import SOLVE, ATTEMPT, PATTERN, REVIEW
+from storage import open_storage
 
 # Add this master pattern list at the top of the class
 DSA_MASTER_PATTERNS = [
@@ -38,8 +47,59 @@ DSA_LEARNING_ORDER = [
     "Bit Manipulation"
 ]
 
+# JSON schema of a structured solution analysis (the fields display_analysis_results shows)
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "correct": {"type": "boolean"},
+        "approach_summary": {"type": "string"},
+        "complexity": {"type": "string", "description": "Time and space complexity with a short justification"},
+        "brute_force": {"type": "string"},
+        "mistakes": {"type": "array", "items": {"type": "string"}},
+        "fixed_code": {"type": "string", "description": "Corrected/optimal solution code"},
+        "annotated_code": {"type": "string", "description": "The user's code with explanatory comments"},
+        "flashcards": {"type": "array", "items": {"type": "string"}, "description": "'Question;Answer' strings"}
+    },
+    "required": ["correct", "approach_summary", "complexity", "mistakes", "fixed_code", "flashcards"]
+}
+
+# Everything generated for one solved problem, requested in a single round trip
+PROBLEM_BUNDLE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "pattern": {"type": "string", "enum": DSA_LEARNING_ORDER},
+        "notes": {"type": "string", "description": "Full Markdown study notes"},
+        "analysis": ANALYSIS_SCHEMA,
+        "flashcards": {"type": "array", "items": {"type": "string"}, "description": "5-7 'Question;Answer' strings"}
+    },
+    "required": ["pattern", "notes", "analysis", "flashcards"]
+}
+
+# Systems with unsaved changes are flushed when the interpreter exits
+_live_systems = weakref.WeakSet()
+
+
+def _flush_live_systems():
+    for system in list(_live_systems):
+        system.flush(compact=True)
+
+
+atexit.register(_flush_live_systems)
+
+
 class DSAMasterySystem:
-    """Core system for DSA practice and note management"""
+    """Core system for DSA practice and note management.
+
+    Problems and progress are kept in memory and persisted through a
+    storage backend (see storage.py). With the default JSON storage,
+    progress changes are appended to a ProgressJournal as they happen
+    (solves are synced at once) and folded into progress.json every
+    PROGRESS_JOURNAL_COMPACT_RECORDS records and at shutdown, while changed
+    problems are written behind, PERSIST_DEBOUNCE_SECONDS after the last
+    change. The SQLite storage commits each change at once and answers the
+    unsolved/pattern/progress queries with indexed SQL. flush() writes
+    everything still pending; nothing is written if nothing changed.
+    """
     
     # Define the recommended learning order for DSA patterns
     DSA_LEARNING_ORDER = [
@@ -65,25 +125,37 @@ class DSAMasterySystem:
     
     def __init__(self):
         """Initialize the system"""
+        self._dirty = set()
+        self._changed_problems = {}
+        self._flush_timer = None
+        self._copy = None  # the problems as of the last change, for the write-behind timer
+        self._copy_index = {}
+        self._persist_lock = threading.RLock()
+        _live_systems.add(self)
+        
+        self.storage = open_storage()
         self.progress = self.load_progress()
         self.neetcode = self.load_neetcode()
         self.ensure_directories()
         self._ensure_patterns()
+        completed_ids = set(self._completed_ids())
+        stale = [p for p in self.neetcode
+                 if p.get("id") in completed_ids and str(p.get("status", "")).lower() != "completed"]
+        self.catalog = ProblemCatalog(self.neetcode, completed_ids)
+        if stale:
+            # The catalog just marked these completed from progress; store that too
+            self._mark_dirty("neetcode", problems=stale)
         
         # Initialize current pattern if not set
-        if "current_pattern" not in self.progress["stats"]:
+        if "current_pattern" not in self.progress["stats"] and self.get_all_patterns():
             self.progress["stats"]["current_pattern"] = self.get_all_patterns()[0]
-        self._save_progress()
+            self._log_change(PATTERN, stats=("current_pattern",))
+        if self.storage.needs_compaction():
+            self._mark_dirty("progress")
 
     def load_progress(self):
-        """Load progress from file or create new if not exists"""
-        if os.path.exists(PROGRESS_FILE):
-            try:
-                with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except Exception as e:
-                print(f"Error loading progress: {e}")
-        return {
+        """Load progress from storage, or create new if there is none"""
+        return self.storage.load_progress({
             "problems": {},
             "patterns": {},
             "stats": {
@@ -92,11 +164,17 @@ class DSAMasterySystem:
                 "streak": 0,
                 "last_run": datetime.now().isoformat()
             }
-        }
+        })
     
+    def _completed_ids(self):
+        """Ids that progress.json records as completed (mark_problem_completed only writes there)"""
+        return [
+            problem_id for problem_id, entry in self.progress.get("problems", {}).items()
+            if entry.get("solved") or str(entry.get("status", "")).lower() == "completed"
+        ]
+
     def load_neetcode(self):
-        with open(NEETCODE_FILE) as f:
-            return json.load(f)
+        return self.storage.load_problems()
     
     def ensure_directories(self):
         Path(OBSIDIAN_VAULT).mkdir(parents=True, exist_ok=True)
@@ -109,9 +187,13 @@ class DSAMasterySystem:
     
     def get_unsolved_problems(self, difficulty=None):
         """Get all unsolved problems with optional difficulty filter"""
-        return [p for p in self.neetcode 
-                if str(p.get("status", "")).lower() != "completed"
-                and (difficulty is None or p.get("difficulty", "").lower() == difficulty.lower() if difficulty else True)]
+        if self.storage.indexed:
+            return self._problems(self.storage.unsolved_ids(difficulty=difficulty or None))
+        return self.catalog.unsolved(difficulty=difficulty or None)
+
+    def _problems(self, problem_ids):
+        """The in-memory problem dicts for ids returned by a storage query"""
+        return [p for p in map(self.catalog.get, problem_ids) if p is not None]
     
     def get_random_unsolved(self, difficulty=None):
         """Get random unsolved problem with optional difficulty filter"""
@@ -120,184 +202,84 @@ class DSAMasterySystem:
     
     def get_problem_by_id(self, problem_id):
         """Get problem by ID (e.g., 'LC1')"""
-        return next((p for p in self.neetcode if p.get("id") == problem_id), None)
+        return self.catalog.get(problem_id)
     
     def analyze_solution(self, problem, solution_code):
         """Analyze a solution for correctness, complexity, and generate improvement suggestions"""
-        prompt = f"""You are a senior software engineer and DSA expert. Analyze this {problem['title']} solution:
-
-CODE TO ANALYZE:
-```
-{solution_code}
-```
-
-PROBLEM LINK: {problem['url']}
-
-Provide a detailed analysis in this format:
-1. CORRECTNESS
-- Is the solution logically correct?
-- Does it handle edge cases?
-- Any potential bugs or issues?
-
-2. COMPLEXITY ANALYSIS
-- Time complexity with explanation
-- Space complexity with explanation
-- Could we optimize further?
-
-3. CODE QUALITY
-- Code style and readability
-- Variable naming
-- Comments and documentation
-- Any code smells?
-
-4. APPROACH ANALYSIS
-- What pattern/technique is used?
-- Why is this approach good/bad?
-- Alternative approaches?
-
-5. LEARNING POINTS
-- Key insights from this solution
-- Common pitfalls to avoid
-- Similar problems to practice
-
-6. IMPROVEMENT SUGGESTIONS
-- Specific ways to optimize
-- Better approaches to consider
-- Code quality improvements
-
-Format your response in Markdown with clear sections and code examples where relevant.
-"""
-        return call_ai_api(prompt)
+        return call_template("analysis", code_sections={"solution_code": solution_code},
+                             title=problem['title'], url=problem['url'])
 
     def generate_full_notes(self, problem, analysis):
         """Generate comprehensive DSA notes including problem, solution, and analysis"""
-        prompt = f"""You are a DSA expert creating detailed study notes. Generate comprehensive notes for this problem:
-
-PROBLEM: {problem['title']}
-URL: {problem['url']}
-PATTERN: {problem.get('pattern', 'Unknown')}
-
-ANALYSIS:
-{analysis}
-
-Create detailed notes in this format:
-
-# {problem['title']}
-
-## Problem Understanding
-- Clear explanation of the problem
-- Key constraints and requirements
-- Example walkthrough with visualization
-- Edge cases to consider
-
-## Approach
-- Intuition behind the solution
-- Step-by-step solution strategy
-- Why this approach works
-- Pattern recognition tips
-
-## Solution Breakdown
-- Detailed code explanation
-- Key steps highlighted
-- Important variables/data structures
-- Critical algorithm steps
-
-## Complexity Analysis
-- Time complexity with explanation
-- Space complexity with explanation
-- Optimization possibilities
-
-## Implementation Details
-- Code implementation tips
-- Common pitfalls to avoid
-- Best practices to follow
-- Important edge cases
-
-## Learning Points
-- Key takeaways
-- Similar problems
-- Pattern application
-- Interview tips
-
-## Code
-```java
-// Include fully commented solution
-```
-
-Format in clean Markdown with:
-- Clear headings
-- Bullet points for readability
-- Code snippets where helpful
-- Visual explanations if needed
-
-Make it comprehensive but focused - each section should provide unique value."""
-        return call_ai_api(prompt)
+        return call_template("full_notes", text_sections={"analysis": analysis},
+                             title=problem['title'], url=problem['url'], pattern=problem.get('pattern', 'Unknown'))
+
+    def generate_problem_bundle(self, problem, solution_code, analysis=None):
+        """Generate pattern, notes, analysis and flashcards for a problem in one structured request.
+
+        Fields the caller already has (a known pattern, an existing analysis)
+        are left out of the request. Returns a dict; fields the model did not
+        deliver even after the re-ask are absent.
+        """
+        schema = json.loads(json.dumps(PROBLEM_BUNDLE_SCHEMA))
+        if problem.get("pattern"):
+            del schema["properties"]["pattern"]
+            schema["required"].remove("pattern")
+        if analysis:
+            del schema["properties"]["analysis"]
+            schema["required"].remove("analysis")
+        return call_template(
+            "bundle", parse_json=True, schema=schema,
+            code_sections={"solution_code": solution_code.strip() if solution_code else "// No user solution provided"},
+            text_sections={"analysis_section": f"EXISTING ANALYSIS:\n{analysis}" if analysis else ""},
+            title=problem['title'], url=problem['url'], difficulty=problem.get('difficulty', 'Unknown'),
+            pattern=problem.get('pattern') or 'Unknown - choose one from the schema enum',
+        )
 
     def generate_code_explanation(self, problem, code, language):
         """Generate a detailed explanation of the code solution"""
-        prompt = f"""As a DSA expert, explain this {problem['title']} solution in detail:
-
-CODE:
-```{language}
-{code}
-```
-
-Provide a thorough explanation in this format:
-
-1. SOLUTION OVERVIEW
-- High-level approach
-- Key algorithm/data structures used
-- Why this approach works
-
-2. CODE WALKTHROUGH
-- Line-by-line explanation
-- Key variables and their roles
-- Critical sections highlighted
-- Edge case handling
-
-3. COMPLEXITY ANALYSIS
-- Time complexity breakdown
-- Space complexity breakdown
-- Optimization opportunities
-
-4. IMPLEMENTATION INSIGHTS
-- Clever tricks used
-- Important decisions explained
-- Alternative approaches
-- Potential improvements
-
-5. LEARNING POINTS
-- Key takeaways
-- Similar patterns
-- Common mistakes to avoid
-- Interview tips
-
-Make it detailed but clear, using:
-- Simple language
-- Step-by-step explanations
-- Examples where helpful
-- Clear formatting
-
-Focus on helping others understand both the approach and implementation details."""
-        return call_ai_api(prompt)
-
-    def auto_detect_pattern(self, problem):
-        """Auto-detect the DSA pattern for a problem"""
-        prompt = f"""As a DSA expert, analyze this problem and determine its core pattern:
-
-PROBLEM: {problem['title']}
-URL: {problem['url']}
-
-Available patterns:
-{', '.join(self.DSA_LEARNING_ORDER)}
-
-Determine:
-1. Primary pattern used
-2. Why this pattern fits
-3. Any secondary patterns
-
-Return ONLY the primary pattern name exactly as shown in the list above. No explanation needed."""
-        return call_ai_api(prompt)
+        return call_template("code_explanation", code_sections={"code": code},
+                             title=problem['title'], language=language)
+
+    def _list_pattern(self, pattern):
+        """The label this problem list already uses for pattern (e.g. "Arrays" for
+        "Arrays & Hashing"), so a predicted name doesn't split one pattern in two"""
+        if not pattern:
+            return pattern
+        target = canonical_pattern(pattern)
+        labels = Counter(p["pattern"] for p in self.neetcode
+                         if p.get("pattern") and canonical_pattern(p["pattern"]) == target)
+        return labels.most_common(1)[0][0] if labels else pattern
+
+    def classify_pattern(self, problem, solution_code=None):
+        """Local guess at a problem's pattern: (pattern, confidence between 0 and 1)"""
+        if getattr(self, "_pattern_classifier", None) is None:
+            self._pattern_classifier = PatternClassifier().fit(p for p in self.neetcode if p.get("pattern"))
+        pattern, confidence = self._pattern_classifier.predict(problem, solution_code)
+        return self._list_pattern(pattern), confidence
+
+    def auto_detect_pattern(self, problem, solution_code=None):
+        """Auto-detect the DSA pattern for a problem.
+
+        Uses the local classifier and only asks the LLM when its confidence is
+        below PATTERN_CLASSIFIER_THRESHOLD.
+        """
+        pattern, confidence = self.classify_pattern(problem, solution_code)
+        if pattern and confidence >= PATTERN_CLASSIFIER_THRESHOLD:
+            return pattern
+        print(f"🤔 Pattern classifier unsure for {problem.get('title')} ({pattern}, {confidence:.2f}); asking AI")
+        answer = call_template("pattern", title=problem['title'], url=problem['url'],
+                               patterns=', '.join(self.DSA_LEARNING_ORDER)).strip()
+        # Exact name first; otherwise the longest name the answer contains, so
+        # "Advanced Graphs" isn't read as "Graphs"
+        cleaned = answer.strip().strip("`*\"'.").lower()
+        for known in self.DSA_LEARNING_ORDER:
+            if known.lower() == cleaned:
+                return self._list_pattern(known)
+        contained = [known for known in self.DSA_LEARNING_ORDER if known.lower() in answer.lower()]
+        if contained:
+            return self._list_pattern(max(contained, key=len))
+        return pattern or answer
     
     def save_to_obsidian(self, content, path):
         """Save file to Obsidian vault, expanding ~ to user home directory"""
@@ -309,30 +291,36 @@ Return ONLY the primary pattern name exactly as shown in the list above. No expl
     
     def record_solution(self, problem, solution, analysis):
         """Record solution in progress database"""
-        # Auto-detect pattern if not set
+        # A confident local guess saves asking the model for the pattern
+        if not problem.get("pattern"):
+            pattern, confidence = self.classify_pattern(problem, solution)
+            if pattern and confidence >= PATTERN_CLASSIFIER_THRESHOLD:
+                problem["pattern"] = pattern
+
+        # Pattern (if not set), analysis (if none was passed in), notes and flashcards come back
+        # from one structured request; separate prompts only fill in whatever the bundle could not deliver
+        bundle = self.generate_problem_bundle(problem, solution, analysis)
         if "pattern" not in problem or not problem["pattern"]:
-            problem["pattern"] = self.auto_detect_pattern(problem)
-        
-        # Generate full notes
-        full_notes = self.generate_full_notes(problem, analysis)
+            problem["pattern"] = self._list_pattern(bundle.get("pattern")) or self.auto_detect_pattern(problem, solution)
+        analysis = analysis or bundle.get("analysis") or self.analyze_solution(problem, solution)
+        full_notes = bundle.get("notes") or self.generate_full_notes(problem, analysis)
         note_path = self.save_to_obsidian(
             full_notes, 
             f"Problems/{problem['id']} - {problem['title']}.md"
         )
         
         # Save flashcards
-        if 'flashcards' in analysis:
+        if isinstance(analysis, dict) and analysis.get('flashcards'):
             create_flashcards(analysis['flashcards'])
+        else:
+            cards = bundle.get("flashcards") or generate_flashcards(problem, solution, analysis)
+            create_flashcards(cards, problem_title=problem["title"])
         
-        # Update problem status in neetcode list
-        for p in self.neetcode:
-            if p.get("id") == problem.get("id"):
-                p["status"] = "Completed"
-                break
-        
-        # Save updated neetcode list
-        with open(NEETCODE_FILE, "w") as f:
-            json.dump(self.neetcode, f, indent=2)
+        # Update problem status (and pattern, if it was just detected) in the catalog
+        already_solved = self.catalog.is_completed(problem["id"])
+        first_attempt = problem["id"] not in self.progress["problems"]
+        self.catalog.set_pattern(problem["id"], problem["pattern"])
+        self.catalog.set_status(problem["id"], "Completed")
         
         # Update progress file for stats tracking
         self.progress["problems"][problem["id"]] = {
@@ -344,58 +332,186 @@ Return ONLY the primary pattern name exactly as shown in the list above. No expl
             "analysis": analysis
         }
         
-        # Update pattern stats
+        # Update pattern stats; re-solving a problem doesn't count it twice
         pattern_data = self.progress["patterns"].setdefault(problem["pattern"], {
             "solved": 0,
             "attempted": 0
         })
-        pattern_data["solved"] += 1
-        pattern_data["attempted"] += 1
+        if not already_solved:
+            pattern_data["solved"] += 1
+        if first_attempt:
+            pattern_data["attempted"] += 1
         
         # Update global stats
-        self.progress["stats"]["solved"] = len([p for p in self.progress["problems"].values() if p["solved"]])
+        self.progress["stats"]["solved"] = self.catalog.completed_count()
         self.progress["stats"]["streak"] += 1
         self.progress["stats"]["last_run"] = datetime.now().isoformat()
         
-        self._save_progress()
+        self._log_change(SOLVE, problem["id"], replace=True, pattern=problem["pattern"],
+                         stats=("solved", "streak", "last_run"), sync=True)
+        self._mark_dirty("neetcode", immediate=True, problems=[self.catalog.get(problem["id"])])
         
         return full_notes
 
-    def _save_progress(self):
-        """Save progress to file"""
+    def _log_change(self, op, problem_id=None, fields=None, replace=False, pattern=None, stats=(), sync=False):
+        """Journal the current values of what just changed in self.progress.
+
+        fields names the changed keys of the problem's entry (all of them with
+        replace=True), pattern a pattern whose stats changed and stats the
+        changed keys of progress["stats"].
+        """
+        entry = None
+        if problem_id is not None:
+            current = self.progress["problems"][problem_id]
+            entry = dict(current) if replace or fields is None else {k: current.get(k) for k in fields}
+        patterns = {pattern: self.progress["patterns"][pattern]} if pattern in self.progress["patterns"] else None
         try:
-            with open(PROGRESS_FILE, "w", encoding="utf-8") as f:
-                json.dump(self.progress, f, indent=2)
+            self.storage.record_change(op, problem_id, entry, replace=replace, patterns=patterns,
+                                       stats={k: self.progress["stats"][k] for k in stats}, sync=sync)
         except Exception as e:
             print(f"Error saving progress: {e}")
+            self._mark_dirty("progress")
+            return
+        if self.storage.needs_compaction():
+            self._mark_dirty("progress")
+
+    def _mark_dirty(self, *targets, immediate=False, problems=()):
+        """Schedule saving the changed "neetcode" problems and/or compacting "progress" in storage.
+
+        Runs on the thread that made the change. Progress is compacted right
+        away; write-behind problem saves work from a private copy of the
+        problems updated here, so the timer thread never reads data the caller
+        may still be changing.
+        """
+        with self._persist_lock:
+            self._dirty.update(targets)
+            for problem in problems:
+                if problem is not None:
+                    self._changed_problems[problem.get("id")] = problem
+            if (immediate or "progress" in targets or not self.storage.write_behind
+                    or PERSIST_DEBOUNCE_SECONDS <= 0):
+                self.flush()
+                return
+            self._schedule_write_behind([problem for problem in problems if problem is not None])
+
+    def _schedule_write_behind(self, changed=None):
+        """Copy the changed problems (all of them if changed is None) into the
+        write-behind copy and (re)start the debounce timer; call with _persist_lock held"""
+        if self._copy is None or changed is None or any(p.get("id") not in self._copy_index for p in changed):
+            self._copy = copy.deepcopy(self.neetcode)
+            self._copy_index = {problem.get("id"): i for i, problem in enumerate(self._copy)}
+        else:
+            for problem in changed:
+                self._copy[self._copy_index[problem.get("id")]] = copy.deepcopy(problem)
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+        self._flush_timer = threading.Timer(PERSIST_DEBOUNCE_SECONDS, self._write_behind)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def _write_behind(self):
+        """Timer target: save the write-behind copy"""
+        with self._persist_lock:
+            self._flush_timer = None
+            if "neetcode" not in self._dirty or self._copy is None:
+                return
+            changed = [self._copy[self._copy_index[problem_id]] for problem_id in self._changed_problems
+                       if problem_id in self._copy_index]
+            try:
+                self.storage.save_problems(self._copy, changed)
+            except Exception as e:
+                print(f"Error saving {NEETCODE_FILE}: {e}")
+                self._flush_timer = threading.Timer(PERSIST_DEBOUNCE_SECONDS, self._write_behind)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+                return
+            # Every change so far is in the copy: each one updates it before restarting the timer
+            self._changed_problems.clear()
+            self._dirty.discard("neetcode")
+
+    def is_dirty(self):
+        return bool(self._dirty)
+
+    def _save_problems(self):
+        changed = list(self._changed_problems.values())
+        self.storage.save_problems(self.neetcode, changed)
+        for problem in changed:
+            if self._changed_problems.get(problem.get("id")) is problem:
+                del self._changed_problems[problem.get("id")]
+
+    def flush(self, compact=False):
+        """Write everything with unsaved changes now; compact=True also folds the journal into progress.json.
+
+        Reads the live data, so only call it from the thread that changes it.
+        """
+        writers = {
+            "progress": (PROGRESS_FILE, lambda: self.storage.compact(self.progress)),
+            "neetcode": (NEETCODE_FILE, self._save_problems),
+        }
+        with self._persist_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            # Written from the live data below; rebuilt by the next write-behind
+            self._copy = None
+            if compact and self.storage.has_pending_changes():
+                self._dirty.add("progress")
+            for target in sorted(self._dirty):
+                path, write = writers[target]
+                try:
+                    write()
+                    self._dirty.discard(target)
+                except Exception as e:
+                    print(f"Error saving {path}: {e}")
+            try:
+                self.storage.sync()
+            except Exception as e:
+                print(f"Error saving progress: {e}")
+            # Unsaved problems are retried in the background; progress stays in the journal until the next compaction
+            if "neetcode" in self._dirty and self.storage.write_behind and PERSIST_DEBOUNCE_SECONDS > 0:
+                self._schedule_write_behind()
 
     def update_progress(self, problem_id, status, pattern=None):
         """Update progress for a problem"""
-        if problem_id not in self.progress["problems"]:
+        first_attempt = problem_id not in self.progress["problems"]
+        if first_attempt:
             self.progress["problems"][problem_id] = {}
+        entry = self.progress["problems"][problem_id]
+        was_completed = bool(entry.get("solved")) or str(entry.get("status", "")).lower() == "completed"
+        is_completed = status.lower() == "completed"
         
-        self.progress["problems"][problem_id].update({
+        entry.update({
             "status": status,
             "date": datetime.now().isoformat(),
             "pattern": pattern
         })
         
-        # Update pattern stats
+        # Update pattern stats on status transitions only, so repeated updates don't double count
         if pattern:
+            self.catalog.set_pattern(problem_id, pattern)
             if pattern not in self.progress["patterns"]:
                 self.progress["patterns"][pattern] = {"solved": 0, "attempted": 0}
-            if status.lower() == "completed":
-                self.progress["patterns"][pattern]["solved"] += 1
-            self.progress["patterns"][pattern]["attempted"] += 1
+            pattern_data = self.progress["patterns"][pattern]
+            if is_completed and not was_completed:
+                pattern_data["solved"] += 1
+            elif was_completed and not is_completed:
+                pattern_data["solved"] = max(0, pattern_data["solved"] - 1)
+            if first_attempt:
+                pattern_data["attempted"] += 1
         
         # Update global stats
-        self.progress["stats"]["solved"] = len([p for p in self.progress["problems"].values() if p.get("status", "").lower() == "completed"])
+        self.catalog.set_status(problem_id, status)
+        self.progress["stats"]["solved"] = self.catalog.completed_count()
         self.progress["stats"]["last_run"] = datetime.now().isoformat()
         
-        self._save_progress()
+        self._log_change(SOLVE if is_completed else ATTEMPT, problem_id, ("status", "date", "pattern"),
+                         pattern=pattern, stats=("solved", "last_run"))
+        self._mark_dirty("neetcode", problems=[self.catalog.get(problem_id)])
 
     def get_progress(self):
         """Get current progress stats"""
+        if self.storage.indexed:
+            return self.storage.progress_summary()
         return {
             "total_problems": len(self.neetcode),
             "solved": self.progress["stats"]["solved"],
@@ -404,28 +520,29 @@ Return ONLY the primary pattern name exactly as shown in the list above. No expl
             "last_run": self.progress["stats"]["last_run"]
         }
 
+    def get_counters(self):
+        """Live completed/attempted/total counts: .totals, .patterns and .difficulties"""
+        return self.catalog.counters
+
     def get_patterns(self):
         """Return a sorted list of all patterns in the problem set."""
         return self.get_all_patterns()
 
     def get_all_patterns(self):
         """Get list of all available patterns"""
-        return sorted(list(set([p.get("pattern", "") for p in self.neetcode if p.get("pattern")])))
+        return self.catalog.patterns()
 
     def get_problems_by_pattern(self, pattern=None):
         """Get all problems for a specific pattern"""
         if pattern is None or pattern.lower() == "any":
             return self.neetcode
-        return [p for p in self.neetcode if str(p.get("pattern", "")).lower() == pattern.lower()]
+        if self.storage.indexed:
+            return self._problems(self.storage.pattern_ids(pattern))
+        return self.catalog.by_pattern(pattern)
 
     def get_next_pattern(self):
         """Return the next pattern with unsolved problems, or None if all done."""
-        patterns = self.get_all_patterns()
-        for pattern in patterns:
-            problems = self.get_problems_by_pattern(pattern)
-            if any(str(p.get("status", "")).lower() != "completed" for p in problems):
-                return pattern
-        return None
+        return self.catalog.next_pattern_with_unsolved()
 
     def _ensure_patterns(self):
         """Ensure every problem has a pattern assigned"""
@@ -451,29 +568,32 @@ Return ONLY the primary pattern name exactly as shown in the list above. No expl
             "Bit Manipulation": "Bit Manipulation"
         }
         
+        changed = []
         for problem in self.neetcode:
             if not problem.get("pattern"):
+                changed.append(problem)
                 # Use category mapping as fallback if no pattern is set
                 category = problem.get("category", "")
-                problem["pattern"] = category_to_pattern.get(category, category)
+                problem["pattern"] = self._list_pattern(category_to_pattern.get(category, category))
                 
                 # If still no pattern, try to detect it
                 if not problem["pattern"]:
                     problem["pattern"] = self.auto_detect_pattern(problem)
         
-        # Save updated problems
-        with open(NEETCODE_FILE, "w") as f:
-            json.dump(self.neetcode, f, indent=2)
+        # Save updated problems, only if a pattern was filled in
+        if changed:
+            self._mark_dirty("neetcode", problems=changed)
 
     def get_current_pattern(self):
         """Get the current pattern being studied"""
-        return self.progress["stats"].get("current_pattern", self.get_all_patterns()[0])
+        return self.progress["stats"].get("current_pattern") or next(iter(self.get_all_patterns()), None)
 
     def set_current_pattern(self, pattern):
         """Set the current pattern to study"""
         if pattern in self.get_all_patterns():
-            self.progress["stats"]["current_pattern"] = pattern
-            self._save_progress()
+            if self.progress["stats"].get("current_pattern") != pattern:
+                self.progress["stats"]["current_pattern"] = pattern
+                self._log_change(PATTERN, stats=("current_pattern",))
             return True
         return False
 
@@ -481,11 +601,30 @@ Return ONLY the primary pattern name exactly as shown in the list above. No expl
         """Get the next unsolved problem in the given pattern"""
         if not pattern:
             return None
-        pattern_problems = self.get_problems_by_pattern(pattern)
-        for problem in pattern_problems:
-            if str(problem.get("status", "")).lower() != "completed":
-                return problem
-        return None
+        upcoming = self.catalog.unsolved(pattern, limit=1)
+        return upcoming[0] if upcoming else None
+
+    def get_upcoming_unsolved_in_pattern(self, pattern, count):
+        """The next count unsolved problems in the given pattern, in study order"""
+        if not pattern:
+            return []
+        return self.catalog.unsolved(pattern, limit=count)
+
+    def prefetch_upcoming(self, count=AI_PREFETCH_COUNT, languages=None):
+        """Warm the AI cache with notes and solutions for the next unsolved problems
+        of the current pattern; returns the number of newly queued requests"""
+        from ai_prefetch import get_prefetcher
+        prefetcher = get_prefetcher()
+        queued = 0
+        for problem in self.get_upcoming_unsolved_in_pattern(self.get_current_pattern(), count):
+            if not problem.get("pattern"):
+                continue
+            prompt, template = render_template("solve_notes", title=problem['title'], pattern=problem['pattern'])
+            queued += prefetcher.submit(prompt, template.family, template.fingerprint)
+            for language in languages or AI_PREFETCH_LANGUAGES:
+                prompt, template = render_template("solution", title=problem['title'], language=language)
+                queued += prefetcher.submit(prompt, template.family, template.fingerprint)
+        return queued
 
     def get_learning_order(self):
         """Get the recommended learning order for DSA patterns"""
@@ -506,52 +645,12 @@ Return ONLY the primary pattern name exactly as shown in the list above. No expl
     
     def generate_dsa_note(self, problem, solution_code):
         """Generate a comprehensive DSA note for the given problem and solution"""
-        prompt = f'''
-You are an expert DSA teacher and interviewer. For the following LeetCode problem, generate a world-class study note for a student who wants to master DSA and ace interviews. The note must:
-
-- Start with YAML frontmatter including:
-  pattern: {problem.get('pattern', '')}
-  tags: [{problem.get('category', '')}, {problem.get('difficulty', '')}]
-  last_reviewed: ""
-  revision_status: "new"
-
-- Give the problem statement and at least one example input/output.
-
-- Give 2–3 hints to help the student think about the problem.
-
-- Write a section on intuition (how to approach the problem, what to look for) as a separate section BEFORE the code block.
-
-- Write a section on the general approach for this pattern (how to solve similar problems).
-
-- Show the brute force solution (with code, and all comments INSIDE the code block as inline comments). Briefly explain why it’s brute force and its limitations.
-
-- Show the best/optimal solution (with code, and all comments INSIDE the code block as inline comments for every step/block).
-  - At the top or bottom of the code, include a commented-out section listing all Java methods/classes/concepts used, with 1–2 line explanations for each.
-  - After the code, break down the solution step-by-step in plain English.
-  - Highlight what makes this solution optimal.
-
-- List key insights and edge cases as bullet points.
-
-- Give time and space complexity.
-
-- End with 5–7 high-quality Anki flashcards (Q;A format).
-
-- Use only ### or #### for headings, never # or ##.
-- Use --- to separate major sections.
-
-Format the note as Markdown, with clear sections, smaller headings, bullet points, and horizontal dividers (---) between major sections. The best solution section should be the highlight and most detailed.
-
-Problem Title: {problem['title']}
-LeetCode Link: {problem['url']}
-Difficulty: {problem['difficulty']}
-Pattern: {problem.get('pattern', '')}
-
-User's Java Solution (if any):
-```java
-{solution_code.strip() if solution_code else '// No user solution provided'}
-```
-'''
-        note_md = call_ai_api(prompt)
+        note_md = call_template(
+            "dsa_note",
+            code_sections={"solution_code": solution_code.strip() if solution_code else "// No user solution provided"},
+            title=problem['title'], url=problem['url'], difficulty=problem['difficulty'],
+            pattern=problem.get('pattern', ''), category=problem.get('category', ''),
+        )
         # Extract flashcards (Q;A) from the note (simple heuristic: lines starting with Q: or similar)
         flashcards = []
         for line in note_md.splitlines():
@@ -597,6 +696,7 @@ User's Java Solution (if any):
             self.progress["problems"][problem["id"]]["note_path"] = result["note_path"] if result["obsidian"] else None
             self.progress["problems"][problem["id"]]["flashcards"] = flashcards
             self.progress["problems"][problem["id"]]["notebooklm_exported"] = result["notebooklm"]
+            self._log_change(REVIEW, problem["id"], ("note_path", "flashcards", "notebooklm_exported"))
         return result
 
     def mark_problem_completed(self, problem_id):
@@ -605,4 +705,7 @@ User's Java Solution (if any):
             self.progress["problems"][problem_id]["status"] = "completed"
         else:
             self.progress["problems"][problem_id] = {"status": "completed"}
-        self._save_progress()
+        self.catalog.set_status(problem_id, "Completed")
+        self.progress["stats"]["solved"] = self.catalog.completed_count()
+        self._log_change(SOLVE, problem_id, ("status",), stats=("solved",), sync=True)
+        self._mark_dirty("neetcode", immediate=True, problems=[self.catalog.get(problem_id)])
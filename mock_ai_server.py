@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+DSA Mastery System - Mock AI Provider
+A local stand-in for the Groq/OpenRouter chat-completions API, for measuring
+ai_client without spending real quota.
+
+By default it listens on a free port chosen by the OS and prints the URL;
+point the client at it with:
+    GROQ_API_URL=http://127.0.0.1:<port>/v1/chat/completions
+    OPENROUTER_API_URL=http://127.0.0.1:<port>/v1/chat/completions
+
+Latency, token throughput, error rates and 429 bursts are configurable from
+the command line (see --help).
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "array hash map two pointers sliding window stack binary search linked list tree "
+    "trie heap backtracking graph dynamic programming greedy interval complexity"
+).split()
+
+
+class MockSettings:
+    """Behaviour of the mock provider"""
+
+    def __init__(self, latency_median=0.5, latency_sigma=0.5, tokens_per_second=200.0,
+                 completion_tokens=200, error_rate=0.0, rate_limit_rate=0.0,
+                 burst_every=0.0, burst_duration=0.0, retry_after=1.0, seed=None):
+        self.latency_median = latency_median  # seconds to first token, log-normally distributed
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second  # generation speed after the first token
+        self.completion_tokens = completion_tokens  # capped by the request's max_tokens
+        self.error_rate = error_rate  # share of requests answered with a 500
+        self.rate_limit_rate = rate_limit_rate  # share of requests answered with a 429
+        self.burst_every = burst_every  # every N seconds ...
+        self.burst_duration = burst_duration  # ... reject everything with 429 for this long
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.started = time.monotonic()
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "streams": 0}
+        self.lock = threading.Lock()
+
+    def first_token_delay(self):
+        if self.latency_median <= 0:
+            return 0.0
+        with self.lock:
+            return self.latency_median * math.exp(self.random.gauss(0, self.latency_sigma))
+
+    def in_burst(self):
+        if self.burst_every <= 0 or self.burst_duration <= 0:
+            return False
+        return (time.monotonic() - self.started) % self.burst_every < self.burst_duration
+
+    def outcome(self):
+        """'ok', 'error' or 'rate_limited' for the next request"""
+        if self.in_burst():
+            return "rate_limited"
+        with self.lock:
+            roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            return "rate_limited"
+        if roll < self.rate_limit_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def completion(self, prompt, max_tokens):
+        """Deterministic filler text for a prompt, one word per token"""
+        n = max(1, min(self.completion_tokens, max_tokens or self.completion_tokens))
+        rng = random.Random(prompt)
+        return [rng.choice(WORDS) + " " for _ in range(n)]
+
+
+class MockAIHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /chat/completions endpoint, plain or streamed (SSE)"""
+
+    protocol_version = "HTTP/1.1"
+    settings = MockSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.settings.lock:
+                self._send_json(200, dict(self.settings.counts))
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON"}})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        settings = self.settings
+        settings.count("requests")
+        outcome = settings.outcome()
+        if outcome == "rate_limited":
+            settings.count("rate_limited")
+            self._send_json(429, {"error": {"message": "rate limit exceeded"}},
+                            {"Retry-After": str(settings.retry_after)})
+            return
+        time.sleep(settings.first_token_delay())
+        if outcome == "error":
+            settings.count("errors")
+            self._send_json(500, {"error": {"message": "injected server error"}})
+            return
+
+        prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+        pieces = settings.completion(prompt, request.get("max_tokens"))
+        model = request.get("model", "mock-model")
+        usage = {"prompt_tokens": len(prompt) // 4 + 1, "completion_tokens": len(pieces),
+                 "total_tokens": len(prompt) // 4 + 1 + len(pieces)}
+        per_token = 1.0 / settings.tokens_per_second if settings.tokens_per_second > 0 else 0.0
+        if request.get("stream"):
+            settings.count("streams")
+            self._stream(model, pieces, per_token)
+        else:
+            time.sleep(per_token * len(pieces))
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(pieces)}}],
+                "usage": usage,
+            })
+        settings.count("ok")
+
+    def _stream(self, model, pieces, per_token):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        for piece in pieces:
+            time.sleep(per_token)
+            chunk = {"id": chunk_id, "object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_server(settings=None, host="127.0.0.1", port=0):
+    """Run the mock provider on a background thread; returns the server (call .shutdown() to stop).
+
+    port=0 picks a free port; the bound one is server.server_address[1].
+    """
+    handler = type("ConfiguredMockAIHandler", (MockAIHandler,), {"settings": settings or MockSettings()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-ai-server", daemon=True).start()
+    return server
+
+
+def add_arguments(parser):
+    """Mock behaviour options, shared with benchmark_ai.py"""
+    parser.add_argument("--latency-median", type=float, default=0.5, help="median seconds to first token")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal spread of first-token latency")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="generation speed (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=200, help="tokens per answer (capped by max_tokens)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests rejected with 429")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="start a 429 burst every N seconds")
+    parser.add_argument("--burst-duration", type=float, default=0.0, help="length of each 429 burst in seconds")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After sent with 429s")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def settings_from_args(args):
+    return MockSettings(
+        latency_median=args.latency_median, latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second, completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        burst_every=args.burst_every, burst_duration=args.burst_duration,
+        retry_after=args.retry_after, seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="port to listen on (0 = any free port)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = start_server(settings_from_args(args), args.host, args.port)
+    port = server.server_address[1]
+    print(f"🧪 Mock AI provider listening on http://{args.host}:{port}/v1/chat/completions")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("👋 Stopping mock AI provider")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
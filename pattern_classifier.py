@@ -0,0 +1,149 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+# Labels used in problem lists that differ from the learning-order names
+PATTERN_ALIASES = {
+    "Arrays": "Arrays & Hashing",
+    "Graph": "Graphs",
+    "Tree": "Trees",
+    "Trie": "Tries",
+    "Heap": "Heap / Priority Queue",
+    "Heap/Priority Queue": "Heap / Priority Queue",
+    "1-D DP": "1-D Dynamic Programming",
+    "2-D DP": "2-D Dynamic Programming",
+}
+
+# Seed vocabulary per pattern, added to the training data as extra documents so
+# that problems from lists without a category still have strong signals.
+PATTERN_KEYWORDS = {
+    "Arrays & Hashing": "duplicate anagram hash hashmap hashset frequency count group product except "
+                        "encode decode consecutive sequence sudoku top k frequent prefix sum",
+    "Two Pointers": "palindrome two pointers sorted pair sum 3sum container water trapping left right",
+    "Sliding Window": "substring window longest repeating character permutation in string minimum window "
+                      "maximum subarray stock",
+    "Stack": "stack parentheses valid brackets temperatures monotonic polish notation min stack car fleet "
+             "histogram",
+    "Binary Search": "binary search sorted rotated minimum search matrix koko mid median of two sorted "
+                     "time based",
+    "Linked List": "linked list listnode node next cycle reverse merge reorder nth lru cache",
+    "Trees": "tree treenode binary tree bst root subtree depth diameter ancestor level order traversal "
+             "serialize inorder preorder",
+    "Tries": "trie prefix word dictionary word search ii startswith",
+    "Heap / Priority Queue": "heap priority queue kth largest k closest median stream task scheduler "
+                             "heapq priorityqueue twitter",
+    "Backtracking": "combination permutation subsets n queens word search backtrack letter combinations "
+                    "generate partition",
+    "Graphs": "graph island islands course schedule clone bfs dfs rotting walls gates pacific surrounded "
+              "connected components visited grid",
+    "Advanced Graphs": "dijkstra network delay itinerary cheapest flights kruskal prim minimum spanning "
+                       "alien dictionary swim rising water",
+    "1-D Dynamic Programming": "dp climbing stairs house robber coin change decode ways word break "
+                               "longest increasing subsequence partition equal subset memo",
+    "2-D Dynamic Programming": "unique paths longest common subsequence edit distance interleaving "
+                               "distinct subsequences burst balloons regular expression matching grid dp",
+    "Greedy": "greedy jump game gas station hand of straights merge triplets partition labels maximum subarray",
+    "Intervals": "interval intervals meeting rooms merge overlapping insert non overlapping",
+    "Math & Geometry": "matrix rotate spiral pow multiply strings happy number plus one detect squares "
+                       "set matrix zeroes",
+    "Bit Manipulation": "bit bits xor single number counting bits reverse bits missing number sum of two "
+                        "integers hamming",
+}
+
+_TOKEN = re.compile(r"[a-z]+|[0-9]+")
+_CAMEL = re.compile(r"(?<=[a-z])(?=[A-Z])")
+# Code constructs that point at a pattern much more reliably than words do
+_CODE_SIGNALS = {
+    "heapq": "code:heap", "PriorityQueue": "code:heap",
+    "TreeNode": "code:tree", "ListNode": "code:list",
+    "dp[": "code:dp", "memo": "code:dp", "lru_cache": "code:dp",
+    "deque": "code:queue", "visited": "code:visited",
+    "mid": "code:mid", ">>": "code:bit", "<<": "code:bit", "^": "code:bit",
+    "stack": "code:stack", "left < right": "code:twoptr", "left <= right": "code:mid",
+    "children": "code:trie", "intervals": "code:intervals",
+}
+
+
+def canonical_pattern(label):
+    """Map list-specific pattern labels onto the learning-order names"""
+    label = (label or "").strip()
+    return PATTERN_ALIASES.get(label, label)
+
+
+def _words(text):
+    text = _CAMEL.sub(" ", text or "")
+    return _TOKEN.findall(text.lower())
+
+
+def extract_features(problem, solution_code=None):
+    """Tokens for one problem: title words and bigrams, URL slug, category and code signals"""
+    title = _words(problem.get("title", ""))
+    features = list(title)
+    features += [f"{a}_{b}" for a, b in zip(title, title[1:])]
+    slug = (problem.get("url") or "").rstrip("/").rsplit("/", 1)[-1]
+    features += [f"slug:{w}" for w in _words(slug.replace("-", " "))]
+    if problem.get("category"):
+        features.append(f"cat:{canonical_pattern(problem['category']).lower()}")
+    if solution_code:
+        features += [signal for marker, signal in _CODE_SIGNALS.items() if marker in solution_code]
+    return features
+
+
+class PatternClassifier:
+    """Multinomial naive Bayes over problem features.
+
+    Trained on problems that already carry a pattern plus the keyword seed
+    documents; predict() returns the most likely pattern and its posterior
+    probability so callers can fall back to an LLM when unsure.
+    """
+
+    def __init__(self, alpha=0.5):
+        self.alpha = alpha
+        self.class_counts = Counter()
+        self.feature_counts = defaultdict(Counter)
+        self.class_totals = Counter()
+        self.vocabulary = set()
+
+    def fit(self, problems):
+        for pattern, keywords in PATTERN_KEYWORDS.items():
+            words = keywords.split()
+            self._add(pattern, words + [f"slug:{w}" for w in words] + [f"{a}_{b}" for a, b in zip(words, words[1:])])
+        for problem in problems:
+            label = canonical_pattern(problem.get("pattern"))
+            if label:
+                self._add(label, extract_features(problem))
+        self._log_priors = {}
+        total = sum(self.class_counts.values())
+        for label, count in self.class_counts.items():
+            self._log_priors[label] = math.log(count / total)
+        self._log_unknown = {
+            label: math.log(self.alpha / (self.class_totals[label] + self.alpha * len(self.vocabulary)))
+            for label in self.class_counts
+        }
+        return self
+
+    def _add(self, label, features):
+        self.class_counts[label] += 1
+        self.feature_counts[label].update(features)
+        self.class_totals[label] += len(features)
+        self.vocabulary.update(features)
+
+    def predict(self, problem, solution_code=None):
+        """(pattern, confidence) for a problem; confidence is the posterior of the top class"""
+        features = [f for f in extract_features(problem, solution_code) if f in self.vocabulary]
+        if not features or not self.class_counts:
+            return None, 0.0
+        scores = {}
+        vocab_size = len(self.vocabulary)
+        for label, log_prior in self._log_priors.items():
+            counts = self.feature_counts[label]
+            denominator = math.log(self.class_totals[label] + self.alpha * vocab_size)
+            score = log_prior
+            for feature in features:
+                count = counts.get(feature)
+                score += math.log(count + self.alpha) - denominator if count else self._log_unknown[label]
+            scores[label] = score
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        normalizer = sum(math.exp(score - top) for score in scores.values())
+        return best, 1.0 / normalizer
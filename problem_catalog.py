@@ -0,0 +1,211 @@
+import bisect
+
+COMPLETED = "completed"
+ATTEMPTED = "attempted"
+
+
+def _status(problem):
+    return str(problem.get("status", "")).lower()
+
+
+def _new_counts():
+    return {"total": 0, COMPLETED: 0, ATTEMPTED: 0}
+
+
+class ProgressCounters:
+    """Completed/attempted/total counts overall, per pattern and per difficulty.
+
+    The catalog removes a problem's contribution before changing its status
+    or pattern and adds it back afterwards, so the counts follow every
+    transition and re-solving a completed problem changes nothing.
+    """
+
+    def __init__(self):
+        self.totals = _new_counts()
+        self.patterns = {}
+        self.difficulties = {}
+
+    def _groups(self, problem):
+        yield self.totals
+        if problem.get("pattern"):
+            yield self.patterns.setdefault(problem["pattern"], _new_counts())
+        if problem.get("difficulty"):
+            yield self.difficulties.setdefault(problem["difficulty"], _new_counts())
+
+    def add(self, problem, sign=1):
+        status = _status(problem)
+        for counts in self._groups(problem):
+            counts["total"] += sign
+            if status in (COMPLETED, ATTEMPTED):
+                counts[status] += sign
+        for groups, key in ((self.patterns, problem.get("pattern")), (self.difficulties, problem.get("difficulty"))):
+            if key and not groups[key]["total"]:
+                del groups[key]
+
+    def remove(self, problem):
+        self.add(problem, -1)
+
+
+class ProblemCatalog:
+    """Indexes over the problem list for the hot DSAMasterySystem lookups.
+
+    Keeps a dict by id, per-pattern and per-difficulty buckets (in list
+    order, keyed case-insensitively), the set of completed ids, the number
+    of unsolved problems per pattern and ProgressCounters for the dashboard. The problem dicts themselves stay in
+    the shared list; set_status/set_pattern/add change them and update the
+    indexes incrementally, so lookups cost O(1) or O(bucket size).
+    """
+
+    def __init__(self, problems, completed_ids=()):
+        self.problems = problems
+        self._by_id = {}
+        self._position = {}
+        self._by_pattern = {}
+        self._pattern_names = {}
+        self._by_difficulty = {}
+        self._completed = set()
+        self._unsolved_by_pattern = {}
+        self._sorted_patterns = None
+        self.counters = ProgressCounters()
+        completed_ids = set(completed_ids)
+        for position, problem in enumerate(problems):
+            if problem.get("id") in completed_ids and _status(problem) != COMPLETED:
+                problem["status"] = "Completed"
+            self._index(problem, position)
+
+    def _index(self, problem, position):
+        problem_id = problem.get("id")
+        self._by_id[problem_id] = problem
+        self._position[problem_id] = position
+        self._bucket_insert(self._by_difficulty, str(problem.get("difficulty", "")).lower(), problem)
+        if _status(problem) == COMPLETED:
+            self._completed.add(problem_id)
+        self._add_to_pattern(problem)
+        self.counters.add(problem)
+
+    def _bucket_insert(self, buckets, key, problem):
+        bucket = buckets.setdefault(key, [])
+        position = self._position[problem.get("id")]
+        if not bucket or self._position[bucket[-1].get("id")] < position:
+            bucket.append(problem)  # the common case: indexing in list order
+            return
+        keys = [self._position[p.get("id")] for p in bucket]
+        bucket.insert(bisect.bisect_left(keys, position), problem)
+
+    def _add_to_pattern(self, problem):
+        pattern = problem.get("pattern")
+        if not pattern:
+            return
+        key = str(pattern).lower()
+        if key not in self._pattern_names:
+            self._pattern_names[key] = pattern
+            self._sorted_patterns = None
+        self._bucket_insert(self._by_pattern, key, problem)
+        if problem.get("id") not in self._completed:
+            self._unsolved_by_pattern[key] = self._unsolved_by_pattern.get(key, 0) + 1
+
+    def _remove_from_pattern(self, problem):
+        pattern = problem.get("pattern")
+        if not pattern:
+            return
+        key = str(pattern).lower()
+        bucket = self._by_pattern.get(key, [])
+        for i, candidate in enumerate(bucket):
+            if candidate is problem:
+                del bucket[i]
+                break
+        if problem.get("id") not in self._completed:
+            self._unsolved_by_pattern[key] -= 1
+        if not bucket:
+            del self._by_pattern[key]
+            del self._pattern_names[key]
+            self._unsolved_by_pattern.pop(key, None)
+            self._sorted_patterns = None
+
+    def add(self, problem):
+        """Append a new problem to the list and the indexes"""
+        self.problems.append(problem)
+        self._index(problem, len(self.problems) - 1)
+
+    def get(self, problem_id):
+        return self._by_id.get(problem_id)
+
+    def set_status(self, problem_id, status):
+        """Change a problem's status; returns the previous status (None if unknown id)"""
+        problem = self._by_id.get(problem_id)
+        if problem is None:
+            return None
+        previous = problem.get("status", "")
+        was_completed = problem_id in self._completed
+        is_completed = str(status).lower() == COMPLETED
+        self.counters.remove(problem)
+        problem["status"] = status
+        self.counters.add(problem)
+        if was_completed != is_completed:
+            key = str(problem.get("pattern", "")).lower()
+            if is_completed:
+                self._completed.add(problem_id)
+            else:
+                self._completed.discard(problem_id)
+            if key in self._unsolved_by_pattern:
+                self._unsolved_by_pattern[key] += -1 if is_completed else 1
+        return previous
+
+    def set_pattern(self, problem_id, pattern):
+        """Move a problem to another pattern bucket"""
+        problem = self._by_id.get(problem_id)
+        if problem is None or problem.get("pattern") == pattern:
+            return
+        self._remove_from_pattern(problem)
+        self.counters.remove(problem)
+        problem["pattern"] = pattern
+        self._add_to_pattern(problem)
+        self.counters.add(problem)
+
+    def is_completed(self, problem_id):
+        return problem_id in self._completed
+
+    def completed_count(self):
+        return len(self._completed)
+
+    def patterns(self):
+        """Sorted pattern names (as first spelled in the list)"""
+        if self._sorted_patterns is None:
+            self._sorted_patterns = sorted(self._pattern_names.values())
+        return list(self._sorted_patterns)
+
+    def by_pattern(self, pattern):
+        """Problems of a pattern (case-insensitive), in list order"""
+        return list(self._by_pattern.get(str(pattern).lower(), ()))
+
+    def by_difficulty(self, difficulty):
+        return list(self._by_difficulty.get(str(difficulty).lower(), ()))
+
+    def unsolved(self, pattern=None, difficulty=None, limit=None):
+        """Problems not yet completed, optionally of one pattern and/or difficulty, in list order"""
+        if pattern is not None:
+            candidates = self._by_pattern.get(str(pattern).lower(), ())
+        elif difficulty is not None:
+            candidates = self._by_difficulty.get(str(difficulty).lower(), ())
+        else:
+            candidates = self.problems
+        result = []
+        for problem in candidates:
+            if problem.get("id") in self._completed:
+                continue
+            if difficulty is not None and str(problem.get("difficulty", "")).lower() != str(difficulty).lower():
+                continue
+            result.append(problem)
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+    def unsolved_count(self, pattern):
+        return self._unsolved_by_pattern.get(str(pattern).lower(), 0)
+
+    def next_pattern_with_unsolved(self):
+        """First pattern (sorted) that still has unsolved problems, or None"""
+        for pattern in self.patterns():
+            if self.unsolved_count(pattern):
+                return pattern
+        return None
@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+
+from config import (
+    PROGRESS_FILE,
+    PROGRESS_JOURNAL_FILE,
+    PROGRESS_JOURNAL_FSYNC_SECONDS,
+    PROGRESS_JOURNAL_FSYNC_BATCH,
+)
+
+# Kinds of change recorded in the journal
+SOLVE = "solve"
+ATTEMPT = "attempt"
+PATTERN = "pattern"
+REVIEW = "review"  # notes and flashcards saved for later review
+
+
+def apply_record(progress, record):
+    """Apply one journal record to a progress dict.
+
+    Records only ever set values (never increment), so replaying a record
+    that the snapshot already contains is harmless.
+    """
+    problem_id = record.get("problem_id")
+    if problem_id is not None and record.get("entry") is not None:
+        problems = progress.setdefault("problems", {})
+        if record.get("replace"):
+            problems[problem_id] = dict(record["entry"])
+        else:
+            problems.setdefault(problem_id, {}).update(record["entry"])
+    for pattern, pattern_data in (record.get("patterns") or {}).items():
+        progress.setdefault("patterns", {})[pattern] = dict(pattern_data)
+    progress.setdefault("stats", {}).update(record.get("stats") or {})
+
+
+class ProgressJournal:
+    """Append-only log of progress changes next to a progress.json snapshot.
+
+    append() writes one JSON line per change; fsyncs are batched (every
+    PROGRESS_JOURNAL_FSYNC_BATCH records or PROGRESS_JOURNAL_FSYNC_SECONDS
+    after the first unsynced one) unless sync=True. recover() loads the
+    snapshot and replays the journal, dropping a torn last line and skipping
+    corrupt lines before it. compact() writes a new snapshot and empties the
+    journal.
+    """
+
+    def __init__(self, path=PROGRESS_JOURNAL_FILE, snapshot_path=PROGRESS_FILE,
+                 fsync_seconds=PROGRESS_JOURNAL_FSYNC_SECONDS, fsync_batch=PROGRESS_JOURNAL_FSYNC_BATCH):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.fsync_seconds = fsync_seconds
+        self.fsync_batch = fsync_batch
+        self.records = 0
+        self._unsynced = 0
+        self._file = None
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def recover(self, default):
+        """Progress from the snapshot (or default) with the journal tail replayed"""
+        progress = default
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    progress = json.load(f)
+            except Exception as e:
+                print(f"Error loading progress: {e}")
+        replayed = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                lines = f.readlines()
+            good_end = 0
+            for index, line in enumerate(lines):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete line")
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError("not a record")
+                except ValueError:
+                    if index == len(lines) - 1:
+                        # A write cut short by a crash; drop it so new records start on a clean line
+                        print(f"⚠️ Dropping torn record at the end of {self.path}")
+                        break
+                    # Damage in the middle; the records after it are still good
+                    print(f"⚠️ Skipping corrupt record on line {index + 1} of {self.path}")
+                    good_end += len(line)
+                    continue
+                apply_record(progress, record)
+                replayed += 1
+                good_end += len(line)
+            if good_end != os.path.getsize(self.path):
+                os.truncate(self.path, good_end)
+        self.records = replayed
+        if replayed:
+            print(f"📒 Replayed {replayed} progress journal records")
+        return progress
+
+    def append(self, op, problem_id=None, entry=None, replace=False, patterns=None, stats=None, sync=False):
+        """Log one change; sync=True makes it durable before returning.
+
+        entry holds the changed fields of the problem's progress entry, or the
+        whole entry with replace=True; patterns and stats hold new values.
+        """
+        record = {"op": op}
+        if problem_id is not None:
+            record["problem_id"] = problem_id
+            record["entry"] = entry or {}
+            if replace:
+                record["replace"] = True
+        if patterns:
+            record["patterns"] = patterns
+        if stats:
+            record["stats"] = stats
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            self.records += 1
+            self._unsynced += 1
+            if sync or self._unsynced >= self.fsync_batch or self.fsync_seconds <= 0:
+                self.sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.fsync_seconds, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def sync(self):
+        """fsync every appended record"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._file is not None and self._unsynced:
+                os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def compact(self, progress):
+        """Write progress as the new snapshot and empty the journal"""
+        with self._lock:
+            text = json.dumps(progress, indent=2)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self.sync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            # A crash before this truncation only means replaying records the snapshot already has
+            with open(self.path, "w", encoding="utf-8"):
+                pass
+            self.records = 0
+
+    def close(self):
+        with self._lock:
+            self.sync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
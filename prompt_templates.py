@@ -0,0 +1,424 @@
+import hashlib
+from string import Formatter
+
+# Identical opening of every templated prompt. Providers with prompt (prefix)
+# caching can reuse its processing across all prompt families, so it must stay
+# byte-for-byte stable; bump PREFIX_VERSION when editing it.
+PREFIX_VERSION = 2
+SHARED_PREFIX = """You are an expert DSA teacher and interviewer helping a student master the NeetCode 150 \
+for coding interviews. Your answers go straight into Markdown study notes, Anki flashcards or source \
+files, so follow the requested format exactly.
+
+"""
+
+
+class PromptTemplate:
+    """A named, versioned prompt compiled once into literal and field segments.
+
+    render() only joins the precompiled segments with the given variables.
+    fingerprint identifies the exact template text (shared prefix included)
+    and is part of the AI cache key, so editing a template - or bumping its
+    version - invalidates only that template's cached answers.
+    """
+
+    def __init__(self, name, version, family, body, shared_prefix=True):
+        self.name = name
+        self.version = version
+        self.family = family
+        self.text = (SHARED_PREFIX if shared_prefix else "") + body
+        self._segments = []
+        fields = []
+        for literal, field, spec, conversion in Formatter().parse(self.text):
+            if field is not None and (spec or conversion or not field.isidentifier()):
+                raise ValueError(f"Template {name}: only plain {{name}} fields are supported, got {{{field}}}")
+            self._segments.append((literal, field))
+            if field is not None:
+                fields.append(field)
+        self.fields = frozenset(fields)
+        prefix_version = PREFIX_VERSION if shared_prefix else 0
+        digest = hashlib.sha256(f"{name}\0{version}\0{prefix_version}\0{self.text}".encode("utf-8"))
+        self.fingerprint = f"{name}@{version}:{digest.hexdigest()[:12]}"
+
+    def render(self, **variables):
+        """The prompt with every field filled in; extra variables are ignored"""
+        missing = self.fields - variables.keys()
+        if missing:
+            raise KeyError(f"Template {self.name} is missing variables: {', '.join(sorted(missing))}")
+        parts = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(variables[field]))
+        return "".join(parts)
+
+
+_templates = {}
+
+
+def register(name, version, family, body, shared_prefix=True):
+    """Compile and register a template; returns it"""
+    template = PromptTemplate(name, version, family, body, shared_prefix)
+    _templates[name] = template
+    return template
+
+
+def get_template(name):
+    return _templates[name]
+
+
+def list_templates():
+    """name -> fingerprint for every registered template"""
+    return {name: template.fingerprint for name, template in sorted(_templates.items())}
+
+
+register("analysis", 1, "analysis", """Analyze this {title} solution as a senior software engineer:
+
+CODE TO ANALYZE:
+```
+{solution_code}
+```
+
+PROBLEM LINK: {url}
+
+Provide a detailed analysis in this format:
+1. CORRECTNESS
+- Is the solution logically correct?
+- Does it handle edge cases?
+- Any potential bugs or issues?
+
+2. COMPLEXITY ANALYSIS
+- Time complexity with explanation
+- Space complexity with explanation
+- Could we optimize further?
+
+3. CODE QUALITY
+- Code style and readability
+- Variable naming
+- Comments and documentation
+- Any code smells?
+
+4. APPROACH ANALYSIS
+- What pattern/technique is used?
+- Why is this approach good/bad?
+- Alternative approaches?
+
+5. LEARNING POINTS
+- Key insights from this solution
+- Common pitfalls to avoid
+- Similar problems to practice
+
+6. IMPROVEMENT SUGGESTIONS
+- Specific ways to optimize
+- Better approaches to consider
+- Code quality improvements
+
+Format your response in Markdown with clear sections and code examples where relevant.
+""")
+
+register("full_notes", 1, "notes", """Generate comprehensive study notes for this problem:
+
+PROBLEM: {title}
+URL: {url}
+PATTERN: {pattern}
+
+ANALYSIS:
+{analysis}
+
+Create detailed notes in this format:
+
+# {title}
+
+## Problem Understanding
+- Clear explanation of the problem
+- Key constraints and requirements
+- Example walkthrough with visualization
+- Edge cases to consider
+
+## Approach
+- Intuition behind the solution
+- Step-by-step solution strategy
+- Why this approach works
+- Pattern recognition tips
+
+## Solution Breakdown
+- Detailed code explanation
+- Key steps highlighted
+- Important variables/data structures
+- Critical algorithm steps
+
+## Complexity Analysis
+- Time complexity with explanation
+- Space complexity with explanation
+- Optimization possibilities
+
+## Implementation Details
+- Code implementation tips
+- Common pitfalls to avoid
+- Best practices to follow
+- Important edge cases
+
+## Learning Points
+- Key takeaways
+- Similar problems
+- Pattern application
+- Interview tips
+
+## Code
+```java
+// Include fully commented solution
+```
+
+Format in clean Markdown with:
+- Clear headings
+- Bullet points for readability
+- Code snippets where helpful
+- Visual explanations if needed
+
+Make it comprehensive but focused - each section should provide unique value.""")
+
+register("bundle", 1, "bundle", """Prepare study material for one LeetCode problem.
+
+PROBLEM: {title}
+URL: {url}
+DIFFICULTY: {difficulty}
+PATTERN: {pattern}
+
+SOLUTION CODE:
+```
+{solution_code}
+```
+{analysis_section}
+
+Produce:
+- notes: comprehensive Markdown notes (problem understanding, intuition, approach, solution breakdown,
+  complexity analysis, pitfalls and edge cases, similar problems, fully commented Java code)
+- analysis (if requested): correctness, complexity, mistakes and a fixed/optimal solution
+- flashcards: 5-7 high-quality cards, each as "Question;Answer"
+""")
+
+register("code_explanation", 1, "analysis", """Explain this {title} solution in detail:
+
+CODE:
+```{language}
+{code}
+```
+
+Provide a thorough explanation in this format:
+
+1. SOLUTION OVERVIEW
+- High-level approach
+- Key algorithm/data structures used
+- Why this approach works
+
+2. CODE WALKTHROUGH
+- Line-by-line explanation
+- Key variables and their roles
+- Critical sections highlighted
+- Edge case handling
+
+3. COMPLEXITY ANALYSIS
+- Time complexity breakdown
+- Space complexity breakdown
+- Optimization opportunities
+
+4. IMPLEMENTATION INSIGHTS
+- Clever tricks used
+- Important decisions explained
+- Alternative approaches
+- Potential improvements
+
+5. LEARNING POINTS
+- Key takeaways
+- Similar patterns
+- Common mistakes to avoid
+- Interview tips
+
+Make it detailed but clear, using:
+- Simple language
+- Step-by-step explanations
+- Examples where helpful
+- Clear formatting
+
+Focus on helping others understand both the approach and implementation details.""")
+
+register("code_explanation_brief", 1, "analysis", """Problem: {title}
+Description: {description}
+
+Code to explain:
+```{language}
+{code}
+```
+
+Please provide a detailed explanation including:
+1. What the code does step by step
+2. The algorithm/pattern used
+3. Time and space complexity
+4. Key insights and logic
+5. Potential improvements
+
+Format the response in markdown with clear sections.
+""")
+
+register("pattern", 1, "pattern", """Analyze this problem and determine its core pattern:
+
+PROBLEM: {title}
+URL: {url}
+
+Available patterns:
+{patterns}
+
+Determine:
+1. Primary pattern used
+2. Why this pattern fits
+3. Any secondary patterns
+
+Return ONLY the primary pattern name exactly as shown in the list above. No explanation needed.""")
+
+register("dsa_note", 1, "notes", """For the following LeetCode problem, generate a world-class study note for a student who wants to master DSA and ace interviews. The note must:
+
+- Start with YAML frontmatter including:
+  pattern: {pattern}
+  tags: [{category}, {difficulty}]
+  last_reviewed: ""
+  revision_status: "new"
+
+- Give the problem statement and at least one example input/output.
+
+- Give 2–3 hints to help the student think about the problem.
+
+- Write a section on intuition (how to approach the problem, what to look for) as a separate section BEFORE the code block.
+
+- Write a section on the general approach for this pattern (how to solve similar problems).
+
+- Show the brute force solution (with code, and all comments INSIDE the code block as inline comments). Briefly explain why it’s brute force and its limitations.
+
+- Show the best/optimal solution (with code, and all comments INSIDE the code block as inline comments for every step/block).
+  - At the top or bottom of the code, include a commented-out section listing all Java methods/classes/concepts used, with 1–2 line explanations for each.
+  - After the code, break down the solution step-by-step in plain English.
+  - Highlight what makes this solution optimal.
+
+- List key insights and edge cases as bullet points.
+
+- Give time and space complexity.
+
+- End with 5–7 high-quality Anki flashcards (Q;A format).
+
+- Use only ### or #### for headings, never # or ##.
+- Use --- to separate major sections.
+
+Format the note as Markdown, with clear sections, smaller headings, bullet points, and horizontal dividers (---) between major sections. The best solution section should be the highlight and most detailed.
+
+Problem Title: {title}
+LeetCode Link: {url}
+Difficulty: {difficulty}
+Pattern: {pattern}
+
+User's Java Solution (if any):
+```java
+{solution_code}
+```
+""")
+
+register("flashcards", 1, "flashcards", """Create comprehensive Anki flashcards for this problem:
+
+PROBLEM: {title}
+PATTERN: {pattern}
+URL: {url}
+
+CODE:
+```
+{solution_code}
+```
+
+ANALYSIS:
+{analysis}
+
+Create flashcards in these categories:
+
+1. PROBLEM UNDERSTANDING
+- Problem statement → Key requirements and constraints
+- Input/Output → Example with explanation
+- Edge Cases → Important cases to handle
+
+2. SOLUTION APPROACH
+- Problem Pattern → Why this pattern fits
+- Solution Strategy → Step-by-step approach
+- Algorithm Steps → Key steps with explanation
+
+3. IMPLEMENTATION
+- Code Structure → Key components needed
+- Critical Steps → Important implementation details
+- Edge Case Handling → How to handle special cases
+
+4. COMPLEXITY
+- Time Complexity → Explanation with breakdown
+- Space Complexity → Explanation with breakdown
+- Optimization → Possible improvements
+
+5. PATTERN APPLICATION
+- Pattern Recognition → How to identify this pattern
+- Similar Problems → Related problems using same pattern
+- Variations → Common variations of this pattern
+
+Format each flashcard as:
+Front: Clear, concise question
+Back: Detailed explanation with:
+- Main points
+- Examples if helpful
+- Code snippets if relevant
+- Visual hints if applicable
+
+Return in CSV format:
+"Front","Back"
+Make cards focused but comprehensive.""")
+
+register("solve_notes", 1, "notes", """Generate detailed DSA notes for LeetCode problem: {title} (Pattern: {pattern})
+Follow this exact structure with small, well-formatted headings:
+## Problem Statement and Examples
+[Detailed problem description and 2-3 examples]
+## Hints
+[3-5 progressive hints]
+## Intuition
+[Clear explanation of core idea and why it works]
+## General Solution for Pattern
+[Broad approach for {pattern} pattern, with common use cases]
+## Brute-Force Approach
+[Step-by-step brute force solution with complexity analysis]
+## Optimal Solution Breakdown
+[Detailed breakdown of best solution, including time/space complexity, edge cases, and optimizations]
+## Code (Java)
+```java
+[Optimal Java code with thorough inline comments explaining each part]
+```
+Keep AI-generated parts as one-line summaries. Add more prompting guidance in notes for better understanding. Ensure readability with smaller sections.
+""")
+
+register("solution", 1, "solution", """Write ONLY the complete {language} solution code for the LeetCode problem "{title}".
+- Output must be a single fenced code block marked as {language}.
+- Do not include explanations or extra text outside the code block.
+""")
+
+register("analyze_code", 1, "analysis", """Analyze this code for LeetCode problem {title}:
+```{language}
+{code}
+```
+Provide:
+- Correctness
+- Approach summary
+- Complexity
+- Mistakes
+- Fixed code
+- Annotated code
+- Flashcards
+""")
+
+register("chat", 1, "chat", """User's DSA question: {question}
+
+Provide a clear, concise answer focusing on:
+1. Direct answer to the question
+2. Key concepts involved
+3. Example if helpful (short)
+4. Best practices or tips
+
+Keep the response focused and under 150 words.
+""")
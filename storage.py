@@ -0,0 +1,438 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from config import (
+    STORAGE_BACKEND, STORAGE_DB, PROBLEM_LIST, PROBLEM_LIST_FILE, NEETCODE_FILE, PROGRESS_JOURNAL_COMPACT_RECORDS,
+)
+from progress_journal import ProgressJournal, SOLVE, ATTEMPT
+
+# Problem fields with their own column; anything else goes into the extra JSON
+PROBLEM_COLUMNS = ("id", "title", "url", "difficulty", "category", "pattern", "status")
+
+
+def _write_json_atomic(path, data):
+    """Write data as JSON via a temp file, so a crash never leaves a half-written file"""
+    text = json.dumps(data, indent=2)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _load_json_problems(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class JSONStorage:
+    """Problems in neetcode_150.json, progress in progress.json plus a ProgressJournal.
+
+    Writes are cheap to batch, so DSAMasterySystem writes problems behind;
+    queries are answered from the in-memory ProblemCatalog (indexed = False).
+    """
+
+    indexed = False
+    write_behind = True
+
+    def __init__(self, problem_file=NEETCODE_FILE, journal=None):
+        self.problem_file = problem_file
+        self.journal = journal or ProgressJournal()
+
+    def load_problems(self):
+        return _load_json_problems(self.problem_file)
+
+    def save_problems(self, problems, changed=None):
+        """Persist the problem list (the whole file, whatever changed)"""
+        _write_json_atomic(self.problem_file, problems)
+
+    def load_progress(self, default):
+        return self.journal.recover(default)
+
+    def record_change(self, op, problem_id=None, entry=None, replace=False, patterns=None, stats=None, sync=False):
+        self.journal.append(op, problem_id, entry, replace=replace, patterns=patterns, stats=stats, sync=sync)
+
+    def needs_compaction(self):
+        """Journal long enough to fold into the snapshot, or no snapshot written yet"""
+        return self.journal.records >= PROGRESS_JOURNAL_COMPACT_RECORDS or not os.path.exists(self.journal.snapshot_path)
+
+    def has_pending_changes(self):
+        return bool(self.journal.records)
+
+    def compact(self, progress):
+        self.journal.compact(progress)
+
+    def sync(self):
+        self.journal.sync()
+
+
+class SQLiteStorage:
+    """Problems and progress in indexed SQLite tables, one problem list per name.
+
+    Tables: problems (indexed by pattern and by completion/difficulty, in
+    list order), progress_entries (the full per-problem progress dicts),
+    attempts (one row per solve/attempt), notes (note metadata),
+    flashcards, pattern_stats and stats. A list imports its problem_file
+    (and the progress in journal, if given) once on first use; without
+    them it starts empty. Every change is committed as it happens, so
+    there is nothing to write behind or compact.
+    """
+
+    indexed = True
+    write_behind = False
+
+    def __init__(self, db_path=STORAGE_DB, list_name=PROBLEM_LIST, problem_file=None, journal=None):
+        self.db_path = db_path
+        self.list_name = list_name
+        self._local = threading.local()
+        self._init_db()
+        self._import_json(problem_file or f"{list_name}.json", journal)
+
+    def _connect(self):
+        """Return a connection owned by the calling thread"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; write transactions are opened explicitly by _transaction()
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA busy_timeout = 30000")
+            conn.execute("PRAGMA synchronous = NORMAL")  # durable at checkpoints; safe with WAL
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode = WAL")
+        with self._transaction():
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS problems (
+                    list TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    title TEXT,
+                    url TEXT,
+                    difficulty TEXT,
+                    category TEXT,
+                    pattern TEXT,
+                    status TEXT,
+                    pattern_key TEXT NOT NULL DEFAULT '',
+                    difficulty_key TEXT NOT NULL DEFAULT '',
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    extra TEXT NOT NULL DEFAULT '{}',
+                    PRIMARY KEY (list, id)
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_problems_pattern ON problems (list, pattern_key, completed, position)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_problems_unsolved ON problems (list, completed, difficulty_key, position)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_problems_position ON problems (list, position)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS progress_entries (
+                    list TEXT NOT NULL,
+                    problem_id TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (list, problem_id)
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS attempts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    list TEXT NOT NULL,
+                    problem_id TEXT NOT NULL,
+                    op TEXT NOT NULL,
+                    status TEXT,
+                    date TEXT,
+                    recorded_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_attempts_problem ON attempts (list, problem_id, recorded_at)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS notes (
+                    list TEXT NOT NULL,
+                    problem_id TEXT NOT NULL,
+                    note_path TEXT,
+                    notebooklm_exported INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (list, problem_id)
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS flashcards (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    list TEXT NOT NULL,
+                    problem_id TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_flashcards_problem ON flashcards (list, problem_id)")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS pattern_stats (
+                    list TEXT NOT NULL,
+                    pattern TEXT NOT NULL,
+                    solved INTEGER NOT NULL DEFAULT 0,
+                    attempted INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (list, pattern)
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS stats (
+                    list TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    value TEXT,
+                    PRIMARY KEY (list, name)
+                )"""
+            )
+
+    def _import_json(self, problem_file, journal):
+        """One-shot import of the JSON problem list and progress (snapshot plus journal) into this list"""
+        marker = f"imported:{self.list_name}"
+        if self._connect().execute("SELECT 1 FROM meta WHERE name = ?", (marker,)).fetchone():
+            return
+        problems = _load_json_problems(problem_file) if os.path.exists(problem_file) else []
+        progress = journal.recover({}) if journal is not None else {}
+        with self._transaction() as conn:
+            # Another process may have imported while we were reading the files
+            if conn.execute("SELECT 1 FROM meta WHERE name = ?", (marker,)).fetchone():
+                return
+            self._upsert_problems(conn, problems, positions=True)
+            for problem_id, entry in progress.get("problems", {}).items():
+                self._write_entry(conn, problem_id, entry, replace=True)
+                if entry.get("solved") or entry.get("status"):
+                    solved = entry.get("solved") or str(entry.get("status")).lower() == "completed"
+                    self._add_attempt(conn, SOLVE if solved else ATTEMPT, problem_id, entry)
+            for pattern, pattern_data in progress.get("patterns", {}).items():
+                self._write_pattern(conn, pattern, pattern_data)
+            for name, value in progress.get("stats", {}).items():
+                self._write_stat(conn, name, value)
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (marker, str(time.time())))
+        print(f"📦 Imported {len(problems)} problems and {len(progress.get('problems', {}))} progress entries into {self.db_path}")
+
+    # Rows
+
+    def _problem_row(self, problem):
+        extra = {k: v for k, v in problem.items() if k not in PROBLEM_COLUMNS}
+        return (
+            self.list_name, problem.get("id"),
+            problem.get("title"), problem.get("url"), problem.get("difficulty"), problem.get("category"),
+            problem.get("pattern"), problem.get("status"),
+            str(problem.get("pattern") or "").lower(), str(problem.get("difficulty") or "").lower(),
+            1 if str(problem.get("status", "")).lower() == "completed" else 0,
+            json.dumps(extra),
+        )
+
+    def _upsert_problems(self, conn, problems, positions=False):
+        """Insert or update problems; new ones go to the end of the list unless positions=True (list order)"""
+        next_position = conn.execute(
+            "SELECT COALESCE(MAX(position) + 1, 0) FROM problems WHERE list = ?", (self.list_name,)
+        ).fetchone()[0]
+        rows = []
+        for i, problem in enumerate(problems):
+            row = self._problem_row(problem)
+            rows.append(row[:2] + ((i if positions else next_position + i),) + row[2:])
+        conn.executemany(
+            """INSERT INTO problems (list, id, position, title, url, difficulty, category, pattern, status,
+                                     pattern_key, difficulty_key, completed, extra)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (list, id) DO UPDATE SET
+                   title = excluded.title, url = excluded.url, difficulty = excluded.difficulty,
+                   category = excluded.category, pattern = excluded.pattern, status = excluded.status,
+                   pattern_key = excluded.pattern_key, difficulty_key = excluded.difficulty_key,
+                   completed = excluded.completed, extra = excluded.extra""",
+            rows,
+        )
+
+    def _write_entry(self, conn, problem_id, entry, replace=False):
+        """Store a progress entry (merged into the existing one unless replace) and its notes/flashcards"""
+        data = dict(entry)
+        if not replace:
+            row = conn.execute(
+                "SELECT data FROM progress_entries WHERE list = ? AND problem_id = ?", (self.list_name, problem_id)
+            ).fetchone()
+            if row:
+                data = {**json.loads(row[0]), **entry}
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO progress_entries (list, problem_id, data, updated_at) VALUES (?, ?, ?, ?)",
+            (self.list_name, problem_id, json.dumps(data), now),
+        )
+        if replace:
+            conn.execute("DELETE FROM notes WHERE list = ? AND problem_id = ?", (self.list_name, problem_id))
+        if "note_path" in data or "notebooklm_exported" in data:
+            conn.execute(
+                "INSERT OR REPLACE INTO notes (list, problem_id, note_path, notebooklm_exported, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (self.list_name, problem_id, data.get("note_path"), 1 if data.get("notebooklm_exported") else 0, now),
+            )
+        if "flashcards" in entry or replace:
+            conn.execute("DELETE FROM flashcards WHERE list = ? AND problem_id = ?", (self.list_name, problem_id))
+            cards = []
+            for card in data.get("flashcards") or []:
+                if isinstance(card, str) and ";" in card:
+                    question, answer = card.split(";", 1)
+                    cards.append((self.list_name, problem_id, question.strip(), answer.strip()))
+            conn.executemany("INSERT INTO flashcards (list, problem_id, question, answer) VALUES (?, ?, ?, ?)", cards)
+
+    def _add_attempt(self, conn, op, problem_id, entry):
+        status = entry.get("status") or ("completed" if entry.get("solved") else None)
+        conn.execute(
+            "INSERT INTO attempts (list, problem_id, op, status, date, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (self.list_name, problem_id, op, status, entry.get("date"), time.time()),
+        )
+
+    def _write_pattern(self, conn, pattern, pattern_data):
+        conn.execute(
+            "INSERT OR REPLACE INTO pattern_stats (list, pattern, solved, attempted) VALUES (?, ?, ?, ?)",
+            (self.list_name, pattern, pattern_data.get("solved", 0), pattern_data.get("attempted", 0)),
+        )
+
+    def _write_stat(self, conn, name, value):
+        conn.execute(
+            "INSERT OR REPLACE INTO stats (list, name, value) VALUES (?, ?, ?)",
+            (self.list_name, name, json.dumps(value)),
+        )
+
+    # Storage interface
+
+    def load_problems(self):
+        problems = []
+        for row in self._connect().execute(
+            """SELECT id, title, url, difficulty, category, pattern, status, extra
+               FROM problems WHERE list = ? ORDER BY position""",
+            (self.list_name,),
+        ):
+            problem = dict(zip(PROBLEM_COLUMNS, row[:7]))
+            problem.update(json.loads(row[7]))
+            problems.append(problem)
+        return problems
+
+    def save_problems(self, problems, changed=None):
+        """Upsert the changed problems (all of them if changed is None)"""
+        with self._transaction() as conn:
+            self._upsert_problems(conn, problems if changed is None else changed)
+
+    def load_progress(self, default):
+        conn = self._connect()
+        progress = {
+            "problems": {
+                problem_id: json.loads(data)
+                for problem_id, data in conn.execute(
+                    "SELECT problem_id, data FROM progress_entries WHERE list = ?", (self.list_name,)
+                )
+            },
+            "patterns": {
+                pattern: {"solved": solved, "attempted": attempted}
+                for pattern, solved, attempted in conn.execute(
+                    "SELECT pattern, solved, attempted FROM pattern_stats WHERE list = ?", (self.list_name,)
+                )
+            },
+            "stats": {
+                name: json.loads(value)
+                for name, value in conn.execute("SELECT name, value FROM stats WHERE list = ?", (self.list_name,))
+            },
+        }
+        # Stats never written (a fresh list) or added since start from their defaults,
+        # stored so progress_summary() sees them too
+        missing = {name: value for name, value in default.get("stats", {}).items() if name not in progress["stats"]}
+        if missing:
+            with self._transaction() as conn:
+                for name, value in missing.items():
+                    self._write_stat(conn, name, value)
+            progress["stats"].update(missing)
+        return progress
+
+    def record_change(self, op, problem_id=None, entry=None, replace=False, patterns=None, stats=None, sync=False):
+        """Commit one progress change (see ProgressJournal.append for the arguments)"""
+        with self._transaction() as conn:
+            if problem_id is not None:
+                self._write_entry(conn, problem_id, entry or {}, replace=replace)
+                if op in (SOLVE, ATTEMPT):
+                    self._add_attempt(conn, op, problem_id, entry or {})
+            for pattern, pattern_data in (patterns or {}).items():
+                self._write_pattern(conn, pattern, pattern_data)
+            for name, value in (stats or {}).items():
+                self._write_stat(conn, name, value)
+
+    def needs_compaction(self):
+        return False
+
+    def has_pending_changes(self):
+        return False
+
+    def compact(self, progress):
+        pass
+
+    def sync(self):
+        pass
+
+    # Indexed queries
+
+    def unsolved_ids(self, pattern=None, difficulty=None):
+        """Ids of problems not yet completed, optionally of one pattern and/or difficulty, in list order"""
+        sql = "SELECT id FROM problems WHERE list = ? AND completed = 0"
+        params = [self.list_name]
+        if pattern is not None:
+            sql += " AND pattern_key = ?"
+            params.append(str(pattern).lower())
+        if difficulty is not None:
+            sql += " AND difficulty_key = ?"
+            params.append(str(difficulty).lower())
+        return [row[0] for row in self._connect().execute(sql + " ORDER BY position", params)]
+
+    def pattern_ids(self, pattern):
+        """Ids of a pattern's problems (case-insensitive), in list order"""
+        return [row[0] for row in self._connect().execute(
+            "SELECT id FROM problems WHERE list = ? AND pattern_key = ? ORDER BY position",
+            (self.list_name, str(pattern).lower()),
+        )]
+
+    def progress_summary(self):
+        """The get_progress() dict, computed from the tables"""
+        conn = self._connect()
+        total, solved = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(completed), 0) FROM problems WHERE list = ?", (self.list_name,)
+        ).fetchone()
+        stats = {
+            name: json.loads(value)
+            for name, value in conn.execute(
+                "SELECT name, value FROM stats WHERE list = ? AND name IN ('streak', 'last_run')", (self.list_name,)
+            )
+        }
+        patterns = {
+            pattern: {"solved": s, "attempted": a}
+            for pattern, s, a in conn.execute(
+                "SELECT pattern, solved, attempted FROM pattern_stats WHERE list = ?", (self.list_name,)
+            )
+        }
+        return {
+            "total_problems": total,
+            "solved": solved,
+            "streak": stats.get("streak", 0),
+            "patterns": patterns,
+            "last_run": stats.get("last_run"),
+        }
+
+
+def open_storage(backend=STORAGE_BACKEND, list_name=PROBLEM_LIST, problem_file=PROBLEM_LIST_FILE):
+    """Storage for DSAMasterySystem: "json" (default) or "sqlite" (the list_name list)"""
+    if backend == "sqlite":
+        # progress.json and its journal record progress on NEETCODE_FILE's problems only
+        same_list = os.path.abspath(problem_file) == os.path.abspath(NEETCODE_FILE)
+        return SQLiteStorage(list_name=list_name, problem_file=problem_file,
+                             journal=ProgressJournal() if same_list else None)
+    if backend != "json":
+        print(f"⚠️ Unknown STORAGE_BACKEND {backend!r}, using json")
+    return JSONStorage()
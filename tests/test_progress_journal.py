@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from progress_journal import ATTEMPT, PATTERN, SOLVE, ProgressJournal
+
+
+def _default():
+    return {"problems": {}, "patterns": {}, "stats": {"solved": 0, "streak": 0}}
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "progress.journal"), str(tmp_path / "progress.json")
+
+
+def _journal(paths):
+    path, snapshot_path = paths
+    return ProgressJournal(path, snapshot_path, fsync_seconds=0, fsync_batch=1)
+
+
+def _write_changes(journal):
+    journal.append(ATTEMPT, "LC1", {"status": "Attempted", "pattern": "Arrays & Hashing"},
+                   patterns={"Arrays & Hashing": {"solved": 0, "attempted": 1}})
+    journal.append(SOLVE, "LC1", {"solved": True, "pattern": "Arrays & Hashing"}, replace=True,
+                   patterns={"Arrays & Hashing": {"solved": 1, "attempted": 1}}, stats={"solved": 1, "streak": 1})
+    journal.append(PATTERN, stats={"current_pattern": "Two Pointers"})
+    journal.close()
+
+
+def test_replay_reproduces_state(paths):
+    _write_changes(_journal(paths))
+
+    journal = _journal(paths)
+    progress = journal.recover(_default())
+
+    assert progress == {
+        "problems": {"LC1": {"solved": True, "pattern": "Arrays & Hashing"}},
+        "patterns": {"Arrays & Hashing": {"solved": 1, "attempted": 1}},
+        "stats": {"solved": 1, "streak": 1, "current_pattern": "Two Pointers"},
+    }
+    assert journal.records == 3
+
+
+def test_torn_tail_is_truncated(paths):
+    _write_changes(_journal(paths))
+    path = paths[0]
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op":"solve","problem_id":"LC2","ent')
+
+    journal = _journal(paths)
+    progress = journal.recover(_default())
+
+    assert "LC2" not in progress["problems"]
+    assert journal.records == 3
+    # New records start on a clean line
+    journal.append(ATTEMPT, "LC3", {"status": "Attempted"})
+    journal.close()
+    assert _journal(paths).recover(_default())["problems"]["LC3"] == {"status": "Attempted"}
+
+
+def test_corrupt_middle_line_is_skipped(paths):
+    _write_changes(_journal(paths))
+    path = paths[0]
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()
+    lines.insert(1, "not json\n")
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+
+    journal = _journal(paths)
+    progress = journal.recover(_default())
+
+    # Records after the damage are still replayed and kept on disk
+    assert progress["problems"]["LC1"] == {"solved": True, "pattern": "Arrays & Hashing"}
+    assert progress["stats"]["current_pattern"] == "Two Pointers"
+    assert journal.records == 3
+    with open(path, encoding="utf-8") as f:
+        assert len(f.readlines()) == 4
+
+
+def test_compact_writes_snapshot_and_empties_journal(paths):
+    _write_changes(_journal(paths))
+    journal = _journal(paths)
+    progress = journal.recover(_default())
+
+    journal.compact(progress)
+    journal.close()
+
+    path, snapshot_path = paths
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == ""
+    with open(snapshot_path, encoding="utf-8") as f:
+        assert json.load(f) == progress
+    reopened = _journal(paths)
+    assert reopened.recover(_default()) == progress
+    assert reopened.records == 0
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from progress_journal import SOLVE, ProgressJournal
+from storage import SQLiteStorage, open_storage
+
+
+def _default():
+    return {"problems": {}, "patterns": {}, "stats": {"solved": 0, "streak": 0}}
+
+
+def _write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+@pytest.fixture
+def neetcode_files(tmp_path):
+    problem_file = tmp_path / "neetcode_150.json"
+    _write_json(problem_file, [
+        {"id": "LC1", "title": "Two Sum", "difficulty": "Easy", "pattern": "Arrays & Hashing", "status": "Completed"},
+        {"id": "LC20", "title": "Valid Parentheses", "difficulty": "Easy", "pattern": "Stack"},
+    ])
+    journal = ProgressJournal(str(tmp_path / "progress.journal"), str(tmp_path / "progress.json"), fsync_seconds=0)
+    journal.append(SOLVE, "LC1", {"solved": True, "pattern": "Arrays & Hashing"}, replace=True,
+                   patterns={"Arrays & Hashing": {"solved": 1, "attempted": 1}}, stats={"solved": 1, "streak": 3})
+    journal.close()
+    return str(problem_file), journal
+
+
+def test_import_problems_and_progress(tmp_path, neetcode_files):
+    problem_file, journal = neetcode_files
+    storage = SQLiteStorage(str(tmp_path / "dsa.db"), "neetcode_150", problem_file, journal)
+
+    assert [p["id"] for p in storage.load_problems()] == ["LC1", "LC20"]
+    progress = storage.load_progress(_default())
+    assert progress["problems"]["LC1"] == {"solved": True, "pattern": "Arrays & Hashing"}
+    assert progress["stats"]["streak"] == 3
+    assert storage.unsolved_ids() == ["LC20"]
+
+    # The import runs once; later changes to the files are not picked up again
+    _write_json(problem_file, [])
+    reopened = SQLiteStorage(str(tmp_path / "dsa.db"), "neetcode_150", problem_file, journal)
+    assert len(reopened.load_problems()) == 2
+
+
+def test_second_list_keeps_its_own_problems_and_progress(tmp_path, neetcode_files):
+    problem_file, journal = neetcode_files
+    db_path = str(tmp_path / "dsa.db")
+    SQLiteStorage(db_path, "neetcode_150", problem_file, journal)
+    blind_file = tmp_path / "blind_75.json"
+    _write_json(blind_file, [{"id": "LC121", "title": "Best Time to Buy and Sell Stock", "difficulty": "Easy"}])
+
+    blind = SQLiteStorage(db_path, "blind_75", str(blind_file))
+
+    assert [p["id"] for p in blind.load_problems()] == ["LC121"]
+    assert blind.load_progress(_default()) == _default()
+    assert blind.progress_summary()["solved"] == 0
+
+
+def test_new_list_without_source_file_starts_empty(tmp_path, neetcode_files, monkeypatch):
+    problem_file, journal = neetcode_files
+    monkeypatch.chdir(tmp_path)
+    # progress.json and its journal in the working directory belong to neetcode_150
+    journal.compact(journal.recover(_default()))
+
+    storage = open_storage("sqlite", list_name="grind_169", problem_file="grind_169.json")
+
+    assert storage.load_problems() == []
+    assert storage.load_progress(_default()) == _default()
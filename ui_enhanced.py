@@ -22,12 +22,13 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from dsa_system import DSAMasterySystem
 from config import *
-from ai_client import call_ai_api
+from ai_client import call_template, stream_template
+from ai_metrics import get_metrics
 import os
 from cloud_sync import CloudSync
 import webbrowser
 from streamlit_monaco import st_monaco
-from dsa_system import DSA_LEARNING_ORDER
+from dsa_system import DSA_LEARNING_ORDER, ANALYSIS_SCHEMA
 
 # Theme CSS
 st.markdown("""
@@ -477,9 +478,10 @@ def get_current_page():
 
 def show_top_progress_bar(system):
     """Show a minimal progress bar at the very top"""
-    total_problems = len(system.neetcode)
-    completed = len([p for p in system.neetcode if str(p.get("status", "")).lower() == "completed"])
-    progress_percent = (completed / total_problems) * 100
+    totals = system.get_counters().totals
+    total_problems = totals["total"]
+    completed = totals["completed"]
+    progress_percent = (completed / total_problems) * 100 if total_problems else 0
     
     st.markdown(f"""
         <div style="position: fixed; top: 0; left: 0; right: 0; z-index: 1000; padding: 0;">
@@ -525,9 +527,10 @@ def show_progress_section(system):
     """Show detailed progress tracking and gamification"""
     
     # Get progress data
-    total_problems = len(system.neetcode)
-    completed = len([p for p in system.neetcode if str(p.get("status", "")).lower() == "completed"])
-    attempted = len([p for p in system.neetcode if str(p.get("status", "")).lower() == "attempted"])
+    counters = system.get_counters()
+    total_problems = counters.totals["total"]
+    completed = counters.totals["completed"]
+    attempted = counters.totals["attempted"]
     
     # Calculate completion rate and predict completion
     days_active = (datetime.now() - datetime.fromisoformat(system.progress["stats"]["last_run"])).days + 1
@@ -535,7 +538,7 @@ def show_progress_section(system):
     remaining_problems = total_problems - completed
     days_to_complete = int(remaining_problems / max(avg_problems_per_day, 0.1))
     completion_date = datetime.now() + timedelta(days=days_to_complete)
-    progress_percent = (completed / total_problems) * 100
+    progress_percent = (completed / total_problems) * 100 if total_problems else 0
 
     # Overall Progress Container
     with st.container():
@@ -592,19 +595,9 @@ def show_progress_section(system):
         </div>
         """.format(completion_date.strftime('%B %d, %Y')), unsafe_allow_html=True)
     
-    # Pattern Progress
-    pattern_progress = {}
-    for problem in system.neetcode:
-        pattern = problem.get("pattern", "Other")
-        if pattern not in pattern_progress:
-            pattern_progress[pattern] = {"total": 0, "completed": 0}
-        pattern_progress[pattern]["total"] += 1
-        if str(problem.get("status", "")).lower() == "completed":
-            pattern_progress[pattern]["completed"] += 1
-    
-    # Sort patterns by completion percentage
+    # Pattern Progress, sorted by completion percentage
     sorted_patterns = sorted(
-        pattern_progress.items(),
+        counters.patterns.items(),
         key=lambda x: (x[1]["completed"] / x[1]["total"]) if x[1]["total"] > 0 else 0,
         reverse=True
     )
@@ -651,6 +644,66 @@ def show_dashboard(system):
     st.markdown("### 💡 Daily Tip")
     show_daily_learning_tip()
 
+    show_ai_metrics_panel()
+
+def show_ai_metrics_panel():
+    """AI call latency, cache hit ratio, tokens and errors since the app started"""
+    metrics = get_metrics()
+    with st.expander("⚡ AI Performance"):
+        calls = metrics.counter_total("ai_calls_total")
+        if not calls:
+            st.info("No AI calls yet.")
+            return
+        hits = metrics.counter_total("ai_calls_total", cache="hit")
+        failed = (metrics.counter_total("ai_requests_total", outcome="error")
+                  + metrics.counter_total("ai_requests_total", outcome="rate_limited"))
+        retries = metrics.summary("ai_retries", "family")
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("AI Calls", calls)
+        col2.metric("Cache Hit Ratio", f"{100 * hits / calls:.0f}%")
+        col3.metric("Failed Requests", failed)
+        retried_calls = sum(r["count"] for r in retries.values())
+        total_retries = sum(r["mean"] * r["count"] for r in retries.values() if r["count"])
+        col4.metric("Avg Retries", f"{total_retries / retried_calls:.2f}" if retried_calls else "0")
+
+        def seconds(value):
+            return f"{value:.2f}s" if value is not None else "-"
+
+        rows = []
+        request_latency = metrics.summary("ai_request_seconds", "provider")
+        ttfb = metrics.summary("ai_ttfb_seconds", "provider")
+        queue_wait = metrics.summary("ai_queue_wait_seconds", "provider")
+        prompt_tokens = metrics.summary("ai_prompt_tokens", "provider")
+        completion_tokens = metrics.summary("ai_completion_tokens", "provider")
+        for provider, latency in request_latency.items():
+            rows.append({
+                "Provider": provider,
+                "Requests": latency["count"],
+                "Errors": metrics.counter_total("ai_requests_total", provider=provider, outcome="error"),
+                "429s": metrics.counter_total("ai_requests_total", provider=provider, outcome="rate_limited"),
+                "p50": seconds(latency["p50"]),
+                "p95": seconds(latency["p95"]),
+                "p99": seconds(latency["p99"]),
+                "TTFB p50": seconds(ttfb.get(provider, {}).get("p50")),
+                "Queue p95": seconds(queue_wait.get(provider, {}).get("p95")),
+                "Avg prompt tokens": int(prompt_tokens.get(provider, {}).get("mean") or 0),
+                "Avg completion tokens": int(completion_tokens.get(provider, {}).get("mean") or 0),
+            })
+        if rows:
+            st.markdown("**By provider**")
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+        call_latency = metrics.summary("ai_call_seconds", "family")
+        st.markdown("**End-to-end by prompt family**")
+        st.dataframe(pd.DataFrame([
+            {"Family": family, "Calls": summary["count"], "p50": seconds(summary["p50"]),
+             "p95": seconds(summary["p95"]), "p99": seconds(summary["p99"])}
+            for family, summary in call_latency.items()
+        ]), hide_index=True, use_container_width=True)
+
+        if st.checkbox("Show Prometheus metrics"):
+            st.code(metrics.render_prometheus(), language="text")
+
 def show_todays_problem(system):
     """Show today's recommended problem"""
     problem = system.get_next_unsolved_in_pattern(system.get_current_pattern())
@@ -742,6 +795,10 @@ def show_solve_interface():
     if 'selected_problem' not in st.session_state:
         st.session_state.selected_problem = None
 
+    # Opt-in: warm the cache for what the user is likely to open next
+    if AI_PREFETCH_ENABLED:
+        system.prefetch_upcoming()
+
     # --- Layout: Two Columns ---
     col1, col2 = st.columns([0.8, 2])
 
@@ -821,29 +878,14 @@ def show_solve_interface():
             b_col1, b_col2, b_col3 = st.columns(3)
             with b_col1:
                 if st.button("Generate Notes", use_container_width=True):
-                    prompt = f"""
-                    Generate detailed DSA notes for LeetCode problem: {problem['title']} (Pattern: {problem['pattern']})
-                    Follow this exact structure with small, well-formatted headings:
-                    ## Problem Statement and Examples
-                    [Detailed problem description and 2-3 examples]
-                    ## Hints
-                    [3-5 progressive hints]
-                    ## Intuition
-                    [Clear explanation of core idea and why it works]
-                    ## General Solution for Pattern
-                    [Broad approach for {problem['pattern']} pattern, with common use cases]
-                    ## Brute-Force Approach
-                    [Step-by-step brute force solution with complexity analysis]
-                    ## Optimal Solution Breakdown
-                    [Detailed breakdown of best solution, including time/space complexity, edge cases, and optimizations]
-                    ## Code (Java)
-                    ```java
-                    [Optimal Java code with thorough inline comments explaining each part]
-                    ```
-                    Keep AI-generated parts as one-line summaries. Add more prompting guidance in notes for better understanding. Ensure readability with smaller sections.
-                    """
                     try:
-                        notes = call_ai_api(prompt)
+                        # Stream tokens into a placeholder so the first lines show up immediately
+                        notes_placeholder = st.empty()
+                        notes = ""
+                        for delta in stream_template("solve_notes", title=problem['title'], pattern=problem['pattern']):
+                            notes += delta
+                            notes_placeholder.markdown(notes + "▌")
+                        notes_placeholder.empty()
                         st.session_state.generated_notes = notes
                         st.rerun()  # Rerun to show notes below
                     except Exception as e:
@@ -921,33 +963,15 @@ def show_solve_interface():
 
             with b_col2:
                 if st.button("Analyze Code", use_container_width=True):
-                    prompt = f"""
-                    Analyze this code for LeetCode problem {problem['title']}:
-                    ```{selected_language}
-                    {st.session_state.code_editor_value}
-                    ```
-                    Provide:
-                    - Correctness
-                    - Approach summary
-                    - Complexity
-                    - Mistakes
-                    - Fixed code
-                    - Annotated code
-                    - Flashcards
-                    """
                     try:
-                        analysis = call_ai_api(prompt, parse_json=True)  # Assuming it returns JSON
+                        analysis = call_template("analyze_code", parse_json=True, schema=ANALYSIS_SCHEMA,
+                                                 code_sections={"code": st.session_state.code_editor_value},
+                                                 title=problem['title'], language=selected_language)
                         display_analysis_results(analysis, selected_language)
                     except Exception as e:
                         st.error(f"Failed to analyze code: {e}")
             with b_col3:
                 if st.button("Generate AI Solution", use_container_width=True):
-                    # Build a precise prompt that asks for code only
-                    code_prompt = f"""
-You are a DSA expert. Write ONLY the complete {selected_language} solution code for the LeetCode problem "{problem['title']}".
-- Output must be a single fenced code block marked as {selected_language}.
-- Do not include explanations or extra text outside the code block.
-"""
                     try:
                         # Warn if API keys are missing (will likely use fallback)
                         try:
@@ -957,7 +981,7 @@ You are a DSA expert. Write ONLY the complete {selected_language} solution code
                         except Exception:
                             pass
 
-                        ai_response = call_ai_api(code_prompt)
+                        ai_response = call_template("solution", title=problem['title'], language=selected_language)
                         code_only = extract_code_block_from_response(ai_response, selected_language)
                         if not code_only or "AI-powered" in code_only or "API key" in code_only:
                             # Fallback to a clean language template so the editor is populated with runnable code
@@ -1321,17 +1345,11 @@ def show_floating_ai_chatbox():
                 
                 # Get AI response
                 try:
-                    response = call_ai_api(f"""
-                    User's DSA question: {user_input}
-                    
-                    Provide a clear, concise answer focusing on:
-                    1. Direct answer to the question
-                    2. Key concepts involved
-                    3. Example if helpful (short)
-                    4. Best practices or tips
-                    
-                    Keep the response focused and under 150 words.
-                    """)
+                    response_placeholder = st.empty()
+                    response = ""
+                    for delta in stream_template("chat", question=user_input):
+                        response += delta
+                        response_placeholder.markdown(response + "▌")
                     
                     # Add AI response
                     st.session_state.chat_history.append({
@@ -1576,27 +1594,9 @@ def display_code_explanation(explanation):
 
 def generate_code_explanation(problem, code, language):
     """Generate detailed explanation of the code using AI"""
-    prompt = f"""
-    Problem: {problem['title']}
-    Description: {problem['description']}
-    
-    Code to explain:
-    ```{language}
-    {code}
-    ```
-    
-    Please provide a detailed explanation including:
-    1. What the code does step by step
-    2. The algorithm/pattern used
-    3. Time and space complexity
-    4. Key insights and logic
-    5. Potential improvements
-    
-    Format the response in markdown with clear sections.
-    """
-    
     try:
-        response = call_ai_api(prompt)
+        response = call_template("code_explanation_brief", code_sections={"code": code}, title=problem['title'],
+                                 description=problem['description'], language=language)
         return response
     except Exception as e:
         return f"""